@@ -1,21 +1,106 @@
 -- Add missing columns to blogs table in PostgreSQL
 
 -- Check and add columns one by one
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS slug VARCHAR(255) UNIQUE;
+ALTER TABLE blogs ADD COLUMN IF NOT EXISTS slug VARCHAR(255);
 ALTER TABLE blogs ADD COLUMN IF NOT EXISTS image_alt TEXT;
 ALTER TABLE blogs ADD COLUMN IF NOT EXISTS featured BOOLEAN DEFAULT FALSE;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS meta_title TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS meta_description TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS canonical_url TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS og_title TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS og_description TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS og_image_url TEXT;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS og_image_alt TEXT;
+-- meta_* / og_* SEO fields live in one JSONB document
+ALTER TABLE blogs ADD COLUMN IF NOT EXISTS seo JSONB DEFAULT '{}'::jsonb;
 ALTER TABLE blogs ADD COLUMN IF NOT EXISTS word_count INTEGER DEFAULT 0;
 ALTER TABLE blogs ADD COLUMN IF NOT EXISTS reading_time FLOAT DEFAULT 0.0;
-ALTER TABLE blogs ADD COLUMN IF NOT EXISTS categories TEXT;
+ALTER TABLE blogs ADD COLUMN IF NOT EXISTS categories JSONB DEFAULT '[]'::jsonb;
+
+-- Fold legacy per-field SEO columns into seo, then drop them; both happen in
+-- one statement so no data is lost midway (a no-op once they are gone)
+DO $$
+DECLARE
+    legacy text[];
+    pairs text;
+BEGIN
+    SELECT array_agg(column_name::text), string_agg(format('%L, %I', column_name, column_name), ', ')
+    INTO legacy, pairs
+    FROM information_schema.columns
+    WHERE table_name = 'blogs'
+      AND column_name IN (
+          'meta_title', 'meta_description', 'canonical_url',
+          'og_title', 'og_description', 'og_image_url', 'og_image_alt'
+      );
+    IF legacy IS NOT NULL THEN
+        EXECUTE format(
+            'UPDATE blogs SET seo = COALESCE(seo, ''{}''::jsonb) || jsonb_strip_nulls(jsonb_build_object(%s))',
+            pairs
+        );
+        EXECUTE 'ALTER TABLE blogs '
+            || (SELECT string_agg(format('DROP COLUMN %I', name), ', ') FROM unnest(legacy) AS name);
+    END IF;
+END
+$$;
+
+-- categories used to be a TEXT column holding a JSON array
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'blogs' AND column_name = 'categories') = 'text' THEN
+        ALTER TABLE blogs
+            ALTER COLUMN categories DROP DEFAULT,
+            ALTER COLUMN categories TYPE JSONB USING COALESCE(NULLIF(categories, ''), '[]')::jsonb,
+            ALTER COLUMN categories SET DEFAULT '[]'::jsonb;
+    END IF;
+END
+$$;
+
+-- Slug helper; IMMUTABLE + PARALLEL SAFE so calls can be folded and parallelised
+CREATE OR REPLACE FUNCTION slugify(t text) RETURNS text AS $$
+    SELECT LOWER(REGEXP_REPLACE(REGEXP_REPLACE(t, '[^a-zA-Z0-9\s-]', '', 'g'), '\s+', '-', 'g'))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Fill in slugs for rows inserted without one
+CREATE OR REPLACE FUNCTION blogs_fill_slug() RETURNS trigger AS $$
+BEGIN
+    IF NEW.slug IS NULL OR NEW.slug = '' THEN
+        NEW.slug := slugify(NEW.title);
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_blogs_fill_slug ON blogs;
+CREATE TRIGGER trg_blogs_fill_slug
+BEFORE INSERT ON blogs
+FOR EACH ROW EXECUTE FUNCTION blogs_fill_slug();
 
 -- Generate slugs for existing blogs that don't have one
 UPDATE blogs 
-SET slug = LOWER(REGEXP_REPLACE(REGEXP_REPLACE(title, '[^a-zA-Z0-9\s-]', '', 'g'), '\s+', '-', 'g'))
+SET slug = slugify(title)
 WHERE slug IS NULL OR slug = '';
+
+-- Give later copies of a slug a -<id> suffix so the unique index can be built
+UPDATE blogs b
+SET slug = b.slug || '-' || b.id
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY slug ORDER BY id) AS n
+    FROM blogs
+    WHERE slug IS NOT NULL
+) dup
+WHERE b.id = dup.id AND dup.n > 1;
+
+-- Drop an INVALID ix_blogs_slug left by a failed CONCURRENTLY build, which
+-- IF NOT EXISTS would otherwise skip
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'ix_blogs_slug' AND NOT i.indisvalid
+    ) THEN
+        DROP INDEX ix_blogs_slug;
+    END IF;
+END
+$$;
+
+-- Enforce slug uniqueness with a partial index that skips NULL slugs. This
+-- script may run in one transaction (psql -1), so the index is built without
+-- CONCURRENTLY; on a large, busy table use add_blog_columns_postgres.py instead
+CREATE UNIQUE INDEX IF NOT EXISTS ix_blogs_slug ON blogs (slug) WHERE slug IS NOT NULL;
+
+-- ix_blogs_slug replaces the UNIQUE constraint older schemas created
+ALTER TABLE blogs DROP CONSTRAINT IF EXISTS blogs_slug_key;
@@ -0,0 +1,57 @@
+"""add api analytics rollups
+
+Revision ID: add_api_analytics_rollups
+Revises: add_quiz_attempts_covering_index
+Create Date: 2025-11-30 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_api_analytics_rollups'
+down_revision = 'add_quiz_attempts_covering_index'
+branch_labels = None
+depends_on = None
+
+
+# Materialized view name -> bucket width
+ROLLUPS = {
+    'analytics_rollup_5m': '5 minutes',
+    'analytics_rollup_1h': '1 hour',
+}
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    # Pre-aggregated rollups so dashboards read O(buckets) rows instead of
+    # scanning raw api_analytics. Refreshed by app.tasks.analytics_rollups.
+    # total_response_time (not an average, in ms) is stored so buckets can be summed.
+    # Sampled rows are weighted by sample_rate so the totals estimate all traffic.
+    for view, width in ROLLUPS.items():
+        op.execute(f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+            SELECT
+                date_bin('{width}', created_at, TIMESTAMP '2000-01-01') AS bucket,
+                endpoint,
+                status_code,
+                COALESCE(country, '') AS country,
+                COALESCE(country_code, '') AS country_code,
+                sum(sample_rate) AS request_count,
+                sum(response_time_us::bigint * sample_rate) / 1000.0 AS total_response_time
+            FROM api_analytics
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+        # REFRESH ... CONCURRENTLY requires a unique index over all rows
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{view}_key "
+            f"ON {view} (bucket, endpoint, status_code, country, country_code)"
+        )
+
+
+def downgrade():
+    for view in ROLLUPS:
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
@@ -0,0 +1,36 @@
+"""add api analytics staging
+
+Revision ID: add_api_analytics_staging
+Revises: add_api_analytics_rollups
+Create Date: 2025-12-07 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_api_analytics_staging'
+down_revision = 'add_api_analytics_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    # Optional landing table for the analytics batch writer (ANALYTICS_STAGING=1).
+    # UNLOGGED skips WAL, so writes are cheap but rows not yet flushed are lost
+    # on a crash, which is acceptable for analytics. LIKE ... INCLUDING DEFAULTS
+    # keeps the column order and shares api_analytics' id sequence, so ids are
+    # final at staging time and payload rows can reference them immediately.
+    # app.tasks.analytics_staging moves rows into the partitioned table.
+    op.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS api_analytics_staging
+            (LIKE api_analytics INCLUDING DEFAULTS)
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS api_analytics_staging")
@@ -0,0 +1,71 @@
+"""add blog_tags cascade foreign keys
+
+Revision ID: add_blog_tags_cascade
+Revises: add_stats_counters
+Create Date: 2025-12-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blog_tags_cascade'
+down_revision = 'add_stats_counters'
+branch_labels = None
+depends_on = None
+
+# blog_tags column -> parent table; deleting the parent deletes its links
+CASCADE_FOREIGN_KEYS = {
+    "blog_id": "blogs",
+    "tag_id": "tags",
+}
+
+
+def _constraint_name(column: str) -> str:
+    return f"fk_blog_tags_{column}"
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "blog_tags" not in inspector.get_table_names():
+        return
+    
+    # 004_add_blog_features.sql declares these, but blog_tags created by
+    # metadata.create_all from an older content.py has no foreign keys
+    existing = {
+        tuple(fk["constrained_columns"])
+        for fk in inspector.get_foreign_keys("blog_tags")
+    }
+    missing = {
+        column: parent
+        for column, parent in CASCADE_FOREIGN_KEYS.items()
+        if (column,) not in existing
+    }
+    if not missing:
+        return
+    
+    # Links to rows that were deleted before the cascade existed would
+    # block the constraint
+    for column, parent in missing.items():
+        op.execute(
+            f"DELETE FROM blog_tags WHERE {column} NOT IN (SELECT id FROM {parent})"
+        )
+    
+    # batch mode rebuilds the table on SQLite, which can't ALTER in a FK
+    with op.batch_alter_table("blog_tags") as batch_op:
+        for column, parent in missing.items():
+            batch_op.create_foreign_key(
+                _constraint_name(column), parent, [column], ["id"], ondelete="CASCADE"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    names = {fk["name"] for fk in inspector.get_foreign_keys("blog_tags")}
+    with op.batch_alter_table("blog_tags") as batch_op:
+        for column in CASCADE_FOREIGN_KEYS:
+            if _constraint_name(column) in names:
+                batch_op.drop_constraint(_constraint_name(column), type_="foreignkey")
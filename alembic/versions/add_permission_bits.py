@@ -0,0 +1,63 @@
+"""add permission bits
+
+Revision ID: add_permission_bits
+Revises: add_blog_tags_cascade
+Create Date: 2025-12-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_permission_bits'
+down_revision = 'add_blog_tags_cascade'
+branch_labels = None
+depends_on = None
+
+# Tables that store the OR of their permission bits in perm_bits
+PERM_BITS_TABLES = ("roles", "groups", "user_permissions")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # Fail fast instead of queueing behind long-running transactions
+        op.execute("SET lock_timeout = '3s'")
+        op.execute("SET statement_timeout = '300s'")
+    
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    
+    # Each permission name gets a bit (permissions.id, 0-62). NULL perm_bits
+    # means the row hasn't been backfilled yet (see migrate_permission_bits.py)
+    # and require_permission falls back to the JSON permissions list.
+    # app/migrations/007_add_permission_bits.sql may already have applied
+    # some of this by hand, so each step checks first.
+    if "permissions" not in tables:
+        op.create_table(
+            'permissions',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name'),
+        )
+    
+    for table in PERM_BITS_TABLES:
+        if table not in tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "perm_bits" not in columns:
+            op.add_column(table, sa.Column('perm_bits', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    for table in PERM_BITS_TABLES:
+        if table in tables and "perm_bits" in {column["name"] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column('perm_bits')
+    if "permissions" in tables:
+        op.drop_table('permissions')
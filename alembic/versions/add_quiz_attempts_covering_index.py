@@ -0,0 +1,48 @@
+"""add quiz_attempts covering index
+
+Revision ID: add_quiz_attempts_covering_index
+Revises: widen_payment_quiz_ids
+Create Date: 2025-11-29 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_quiz_attempts_covering_index'
+down_revision = 'widen_payment_quiz_ids'
+branch_labels = None
+depends_on = None
+
+# add_quiz_tables' lookup indexes, covered by the new index's leading columns
+# (nothing queries quiz_attempts by user_id alone)
+REPLACED_INDEXES = (
+    'ix_quiz_attempts_quiz_id',
+    'ix_quiz_attempts_user_id',
+    'ix_quiz_attempts_quiz_user',
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, and
+    # it waits for in-flight transactions, so allow a longer lock wait
+    with op.get_context().autocommit_block():
+        op.execute("SET lock_timeout = '60s'")
+        op.execute("SET statement_timeout = '300s'")
+        # Covering index: "latest attempts for this user in this quiz" is served
+        # by an index-only scan; also covers quiz_id-only lookups via its prefix
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_quiz_user_covering "
+            "ON quiz_attempts (quiz_id, user_id, completed_at DESC) INCLUDE (score, passed, earned_points)"
+        )
+        for index in REPLACED_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("SET lock_timeout = '60s'")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_quiz_id ON quiz_attempts (quiz_id)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_user_id ON quiz_attempts (user_id)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_quiz_user ON quiz_attempts (quiz_id, user_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_quiz_attempts_quiz_user_covering")
@@ -0,0 +1,76 @@
+"""add stats counters
+
+Revision ID: add_stats_counters
+Revises: add_api_analytics_staging
+Create Date: 2025-12-08 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_stats_counters'
+down_revision = 'add_api_analytics_staging'
+branch_labels = None
+depends_on = None
+
+# Tables whose row counts are kept in stats_counters
+COUNTED_TABLES = ("users", "audit_logs")
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    # Row counts for the admin dashboard, kept current by triggers so
+    # get_admin_stats reads one small table instead of running COUNT(*)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stats_counters_bump() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE stats_counters SET value = value + 1 WHERE name = TG_TABLE_NAME;
+            ELSE
+                UPDATE stats_counters SET value = value - 1 WHERE name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in COUNTED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_stats_counter
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION stats_counters_bump()
+        """)
+        # Seed after the trigger exists: CREATE TRIGGER blocks writes to the
+        # table until this transaction commits, so no row is missed or
+        # counted twice
+        op.execute(f"""
+            INSERT INTO stats_counters (name, value)
+            SELECT '{table}', count(*) FROM {table}
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        """)
+    
+    # Active sessions depend on NOW(), so they can't be a counter; a partial
+    # index over unrevoked sessions keeps that count an index-only scan
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_active "
+        "ON sessions (expires_at) WHERE revoked = FALSE"
+    )
+
+
+def downgrade():
+    # idx_sessions_active is left in place: app/migrations/008_add_admin_list_indexes.sql
+    # creates it too, and the admin list queries rely on it
+    for table in COUNTED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_stats_counter ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS stats_counters_bump()")
+    op.execute("DROP TABLE IF EXISTS stats_counters")
@@ -0,0 +1,313 @@
+"""convert api analytics to a partitioned table
+
+Revision ID: convert_api_analytics
+Revises: add_quiz_tables
+Create Date: 2025-11-29 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'convert_api_analytics'
+down_revision = 'add_quiz_tables'
+branch_labels = None
+depends_on = None
+
+# add_api_analytics' plain table is renamed to this while its rows are copied
+LEGACY_TABLE = 'api_analytics_legacy'
+
+# Indexes created by add_api_analytics. Index names are schema-wide, so they
+# are dropped before the partitioned table reuses some of them.
+LEGACY_INDEXES = (
+    'idx_api_analytics_id',
+    'idx_api_analytics_endpoint',
+    'idx_api_analytics_method',
+    'idx_api_analytics_status_code',
+    'idx_api_analytics_user_id',
+    'idx_api_analytics_ip_address',
+    'idx_api_analytics_city',
+    'idx_api_analytics_country',
+    'idx_api_analytics_created_at',
+    'idx_endpoint_method',
+    'idx_endpoint_created',
+    'idx_status_created',
+    'idx_user_created',
+    'idx_city_country',
+)
+
+# Indexes on the partitioned table; they cascade to every partition
+ANALYTICS_INDEXES = {
+    # created_at is append-only and monotonically increasing, so a BRIN index
+    # covers time-range scans at a fraction of a B-tree's size and insert cost
+    'idx_api_analytics_created_at_brin': "USING brin (created_at) WITH (pages_per_range = 128)",
+    'idx_endpoint_method': "(endpoint, method)",
+    # Queries are almost always time-bounded, optionally narrowed to an endpoint
+    'idx_created_endpoint': "(created_at DESC, endpoint)",
+    'idx_status_created': "(status_code, created_at)",
+    'idx_user_created': "(user_id, created_at)",
+    'idx_city_country': "(city, country)",
+}
+
+PARTITIONED_TABLES = ("api_analytics", "api_analytics_payloads")
+
+
+def _add_months(month_start, months):
+    """Return the first day of the month `months` after `month_start`"""
+    month_index = month_start.month - 1 + months
+    return month_start.replace(year=month_start.year + month_index // 12, month=month_index % 12 + 1)
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions. The
+    # copy below scales with the existing table, so it gets a longer budget.
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '1800s'")
+
+    bind = op.get_bind()
+
+    # Move the plain table aside. Analytics writers block on its lock until
+    # this migration commits, then write into the partitioned table.
+    op.execute(f"ALTER TABLE api_analytics RENAME TO {LEGACY_TABLE}")
+    for index in LEGACY_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    # Keep issuing ids from the existing sequence so ids stay unique
+    sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{LEGACY_TABLE}', 'id')")).scalar()
+
+    # api_analytics is partitioned by month on created_at so old data can be
+    # dropped per partition and time-ranged queries are pruned. The partition
+    # key must be part of the primary key.
+    #
+    # Every API request produces a row here. Writers must insert in batches
+    # (AnalyticsService.log_api_calls, which the engine sends as multi-row
+    # INSERT ... VALUES pages via execute_values) rather than one INSERT and
+    # commit per request.
+    op.execute(f"""
+        CREATE TABLE api_analytics (
+            id BIGINT NOT NULL DEFAULT nextval('{sequence}'),
+
+            -- Request Information
+            endpoint VARCHAR(500) NOT NULL,
+            method VARCHAR(10) NOT NULL,
+            path VARCHAR(500) NOT NULL,
+
+            -- Response Information
+            status_code INTEGER NOT NULL,
+            response_time_us INTEGER NOT NULL,  -- microseconds
+            sample_rate SMALLINT NOT NULL DEFAULT 1,  -- row stands for this many requests
+
+            -- User Information
+            user_id INTEGER,
+
+            -- IP and Geolocation
+            ip_address INET,
+            city VARCHAR(100),
+            region VARCHAR(100),
+            country VARCHAR(100),
+            country_code VARCHAR(2),
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+
+            -- Timestamps
+            created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+
+            -- Error message, user agent, referer and request/response
+            -- payloads live in api_analytics_payloads
+
+            -- Note: No foreign key to users table since it uses SQLAlchemy Core
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Wide, rarely read request/response payloads are kept out of the hot
+    # table so aggregate scans over api_analytics touch far fewer pages. It is
+    # partitioned the same way so retention drops both tables per month.
+    op.execute("""
+        CREATE TABLE api_analytics_payloads (
+            analytics_id BIGINT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            query_params JSONB,
+            request_headers JSONB,
+            request_body JSONB,
+            response_body JSONB,
+            error_message TEXT,
+            user_agent VARCHAR(500),
+            referer VARCHAR(500),
+            PRIMARY KEY (analytics_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # EXTENDED (the JSONB default) lets large payloads be compressed and TOASTed
+    op.execute("""
+        ALTER TABLE api_analytics_payloads
+            ALTER COLUMN request_headers SET STORAGE EXTENDED,
+            ALTER COLUMN request_body SET STORAGE EXTENDED,
+            ALTER COLUMN response_body SET STORAGE EXTENDED
+    """)
+
+    # Create partitions for every month that holds existing rows through next
+    # month; later months are created ahead of time by
+    # app.tasks.analytics_partitions, which the app runs daily at startup
+    oldest, newest = bind.execute(sa.text(f"SELECT min(created_at), max(created_at) FROM {LEGACY_TABLE}")).one()
+    current = _month_start(datetime.utcnow())
+    start = min(_month_start(oldest), current) if oldest else current
+    last = max(_month_start(newest), _add_months(current, 1)) if newest else _add_months(current, 1)
+    while start <= last:
+        end = _add_months(start, 1)
+        for table in PARTITIONED_TABLES:
+            op.execute(
+                f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            )
+        start = end
+    # Rows past the last monthly partition (e.g. if maintenance stopped)
+    # land here instead of failing the INSERT; partition maintenance moves
+    # them out when it creates their month
+    for table in PARTITIONED_TABLES:
+        op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+    # Legacy payload columns are free text and ip_address is unvalidated
+    # VARCHAR; values that don't cast keep the text as a JSON string or are
+    # dropped to NULL instead of failing the migration
+    op.execute("""
+        CREATE FUNCTION pg_temp.try_jsonb(value TEXT) RETURNS JSONB
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            RETURN value::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN to_jsonb(value);
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION pg_temp.try_inet(value TEXT) RETURNS INET
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            RETURN value::inet;
+        EXCEPTION WHEN others THEN
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    # response_time was a float in milliseconds
+    op.execute(f"""
+        INSERT INTO api_analytics (
+            id, endpoint, method, path, status_code, response_time_us, sample_rate,
+            user_id, ip_address, city, region, country, country_code,
+            latitude, longitude, created_at
+        )
+        SELECT
+            id, endpoint, method, path, status_code,
+            LEAST(round(response_time * 1000), 2147483647)::integer, 1,
+            user_id, pg_temp.try_inet(ip_address), city, region, country, country_code,
+            latitude, longitude, created_at
+        FROM {LEGACY_TABLE}
+    """)
+    op.execute(f"""
+        INSERT INTO api_analytics_payloads (
+            analytics_id, created_at, query_params, request_headers,
+            request_body, response_body, error_message, user_agent, referer
+        )
+        SELECT
+            id, created_at,
+            pg_temp.try_jsonb(query_params), pg_temp.try_jsonb(request_headers),
+            pg_temp.try_jsonb(request_body), pg_temp.try_jsonb(response_body),
+            error_message, user_agent, referer
+        FROM {LEGACY_TABLE}
+        WHERE query_params IS NOT NULL OR request_headers IS NOT NULL
+            OR request_body IS NOT NULL OR response_body IS NOT NULL
+            OR error_message IS NOT NULL OR user_agent IS NOT NULL OR referer IS NOT NULL
+    """)
+
+    # Hand the sequence to the new table before the legacy one (its owner) is dropped
+    op.execute(f"ALTER SEQUENCE {sequence} AS BIGINT OWNED BY api_analytics.id")
+    op.execute(f"DROP TABLE {LEGACY_TABLE}")
+
+    # Indexes are built once the rows are in. PostgreSQL does not support
+    # CREATE INDEX CONCURRENTLY on a partitioned table. Every index is
+    # maintained on each INSERT into this write-heavy table, so there are no
+    # single-column B-tree indexes: endpoint, status_code, user_id and city
+    # lead the composite indexes, and id is in the primary key.
+    for index, definition in ANALYTICS_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index} ON api_analytics {definition}")
+
+
+def downgrade():
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '1800s'")
+
+    bind = op.get_bind()
+    for index in ANALYTICS_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute(f"ALTER TABLE api_analytics RENAME TO {LEGACY_TABLE}")
+    sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{LEGACY_TABLE}', 'id')")).scalar()
+
+    # Recreate add_api_analytics' plain table and fold the payloads back in
+    op.execute(f"""
+        CREATE TABLE api_analytics (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            endpoint VARCHAR(500) NOT NULL,
+            method VARCHAR(10) NOT NULL,
+            path VARCHAR(500) NOT NULL,
+            query_params TEXT,
+            status_code INTEGER NOT NULL,
+            response_time DOUBLE PRECISION NOT NULL,
+            user_id INTEGER,
+            ip_address VARCHAR(45),
+            city VARCHAR(100),
+            region VARCHAR(100),
+            country VARCHAR(100),
+            country_code VARCHAR(2),
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+            request_headers TEXT,
+            request_body TEXT,
+            response_body TEXT,
+            error_message TEXT,
+            created_at TIMESTAMP NOT NULL,
+            user_agent VARCHAR(500),
+            referer VARCHAR(500),
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"""
+        INSERT INTO api_analytics (
+            id, endpoint, method, path, query_params, status_code, response_time,
+            user_id, ip_address, city, region, country, country_code, latitude, longitude,
+            request_headers, request_body, response_body, error_message, created_at,
+            user_agent, referer
+        )
+        SELECT
+            a.id, a.endpoint, a.method, a.path, p.query_params::text, a.status_code,
+            a.response_time_us / 1000.0, a.user_id, host(a.ip_address), a.city, a.region,
+            a.country, a.country_code, a.latitude, a.longitude,
+            p.request_headers::text, p.request_body::text, p.response_body::text,
+            p.error_message, a.created_at, p.user_agent, p.referer
+        FROM {LEGACY_TABLE} a
+        LEFT JOIN api_analytics_payloads p
+            ON p.analytics_id = a.id AND p.created_at = a.created_at
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY api_analytics.id")
+    op.execute("DROP TABLE api_analytics_payloads")
+    op.execute(f"DROP TABLE {LEGACY_TABLE}")
+
+    op.create_index('idx_api_analytics_id', 'api_analytics', ['id'])
+    op.create_index('idx_api_analytics_endpoint', 'api_analytics', ['endpoint'])
+    op.create_index('idx_api_analytics_method', 'api_analytics', ['method'])
+    op.create_index('idx_api_analytics_status_code', 'api_analytics', ['status_code'])
+    op.create_index('idx_api_analytics_user_id', 'api_analytics', ['user_id'])
+    op.create_index('idx_api_analytics_ip_address', 'api_analytics', ['ip_address'])
+    op.create_index('idx_api_analytics_city', 'api_analytics', ['city'])
+    op.create_index('idx_api_analytics_country', 'api_analytics', ['country'])
+    op.create_index('idx_api_analytics_created_at', 'api_analytics', ['created_at'])
+    op.create_index('idx_endpoint_method', 'api_analytics', ['endpoint', 'method'])
+    op.create_index('idx_endpoint_created', 'api_analytics', ['endpoint', 'created_at'])
+    op.create_index('idx_status_created', 'api_analytics', ['status_code', 'created_at'])
+    op.create_index('idx_user_created', 'api_analytics', ['user_id', 'created_at'])
+    op.create_index('idx_city_country', 'api_analytics', ['city', 'country'])
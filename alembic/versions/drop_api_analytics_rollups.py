@@ -0,0 +1,58 @@
+"""drop api analytics rollups
+
+Revision ID: drop_api_analytics_rollups
+Revises: add_permission_bits
+Create Date: 2025-12-12 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'drop_api_analytics_rollups'
+down_revision = 'add_permission_bits'
+branch_labels = None
+depends_on = None
+
+
+# Materialized view name -> bucket width (as in add_api_analytics_rollups)
+ROLLUPS = {
+    'analytics_rollup_5m': '5 minutes',
+    'analytics_rollup_1h': '1 hour',
+}
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    # Nothing refreshed the rollups, so they went stale right after this
+    # migration created them, and a full refresh re-aggregates all of
+    # api_analytics. Geographic stats read the partitioned base table again.
+    for view in ROLLUPS:
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+
+
+def downgrade():
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    for view, width in ROLLUPS.items():
+        op.execute(f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+            SELECT
+                date_bin('{width}', created_at, TIMESTAMP '2000-01-01') AS bucket,
+                endpoint,
+                status_code,
+                COALESCE(country, '') AS country,
+                COALESCE(country_code, '') AS country_code,
+                sum(sample_rate) AS request_count,
+                sum(response_time_us::bigint * sample_rate) / 1000.0 AS total_response_time
+            FROM api_analytics
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{view}_key "
+            f"ON {view} (bucket, endpoint, status_code, country, country_code)"
+        )
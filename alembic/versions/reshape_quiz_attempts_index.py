@@ -0,0 +1,44 @@
+"""reshape quiz_attempts index
+
+Revision ID: reshape_quiz_attempts_index
+Revises: shard_stats_counters
+Create Date: 2025-12-14 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'reshape_quiz_attempts_index'
+down_revision = 'shard_stats_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, and
+    # it waits for in-flight transactions, so allow a longer lock wait
+    with op.get_context().autocommit_block():
+        op.execute("SET lock_timeout = '60s'")
+        op.execute("SET statement_timeout = '300s'")
+        # The quiz router selects whole rows for one user in one quiz, newest
+        # attempt (started_at) first, so no INCLUDE list makes those scans
+        # index-only and completed_at ordering went unused. Keying on
+        # started_at lets the index return rows pre-sorted, and LIMIT 1 for
+        # the in-progress attempt stops at the first match. quiz_id-only
+        # lookups (deleting a quiz's attempts) still use its prefix.
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_quiz_user_started "
+            "ON quiz_attempts (quiz_id, user_id, started_at DESC)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_quiz_attempts_quiz_user_covering")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("SET lock_timeout = '60s'")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_quiz_attempts_quiz_user_covering "
+            "ON quiz_attempts (quiz_id, user_id, completed_at DESC) INCLUDE (score, passed, earned_points)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_quiz_attempts_quiz_user_started")
@@ -0,0 +1,117 @@
+"""shard stats counters
+
+Revision ID: shard_stats_counters
+Revises: drop_api_analytics_rollups
+Create Date: 2025-12-13 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'shard_stats_counters'
+down_revision = 'drop_api_analytics_rollups'
+branch_labels = None
+depends_on = None
+
+# Tables whose row counts are kept in stats_counters (as in add_stats_counters)
+COUNTED_TABLES = ("users", "audit_logs")
+
+# Rows per counter; concurrent writers land on different rows by backend pid
+COUNTER_SHARDS = 16
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    # The per-row triggers from add_stats_counters made every insert into
+    # users or audit_logs update the same counter row, serializing writers
+    # on its row lock. Counters are now spread over shard rows that readers
+    # sum, and bumped once per statement by the size of its transition table.
+    # Dropping the old triggers locks writers out until this transaction
+    # commits, so no row goes uncounted during the swap.
+    for table in COUNTED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_stats_counter ON {table}")
+    
+    # The existing totals stay in shard 0
+    op.execute("ALTER TABLE stats_counters ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE stats_counters DROP CONSTRAINT IF EXISTS stats_counters_pkey")
+    op.execute("ALTER TABLE stats_counters ADD PRIMARY KEY (name, shard)")
+    
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION stats_counters_bump() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            delta BIGINT;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT count(*) INTO delta FROM new_rows;
+            ELSE
+                SELECT -count(*) INTO delta FROM old_rows;
+            END IF;
+            IF delta <> 0 THEN
+                INSERT INTO stats_counters (name, shard, value)
+                VALUES (TG_TABLE_NAME, pg_backend_pid() % {COUNTER_SHARDS}, delta)
+                ON CONFLICT (name, shard) DO UPDATE SET value = stats_counters.value + EXCLUDED.value;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    # A trigger with transition tables handles one event, hence two per table
+    for table in COUNTED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_stats_counter_insert
+            AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION stats_counters_bump()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_stats_counter_delete
+            AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION stats_counters_bump()
+        """)
+
+
+def downgrade():
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+    
+    for table in COUNTED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_stats_counter_insert ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_stats_counter_delete ON {table}")
+    
+    op.execute("ALTER TABLE stats_counters DROP CONSTRAINT IF EXISTS stats_counters_pkey")
+    op.execute("DELETE FROM stats_counters WHERE shard <> 0")
+    op.execute("ALTER TABLE stats_counters DROP COLUMN IF EXISTS shard")
+    op.execute("ALTER TABLE stats_counters ADD PRIMARY KEY (name)")
+    
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stats_counters_bump() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE stats_counters SET value = value + 1 WHERE name = TG_TABLE_NAME;
+            ELSE
+                UPDATE stats_counters SET value = value - 1 WHERE name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in COUNTED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_stats_counter
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION stats_counters_bump()
+        """)
+        # The shard rows just dropped held part of the count, so recount
+        # (CREATE TRIGGER holds off writers until this transaction commits)
+        op.execute(f"""
+            INSERT INTO stats_counters (name, value)
+            SELECT '{table}', count(*) FROM {table}
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        """)
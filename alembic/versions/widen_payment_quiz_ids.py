@@ -0,0 +1,74 @@
+"""widen payment and quiz ids to bigint identity
+
+Revision ID: widen_payment_quiz_ids
+Revises: convert_api_analytics
+Create Date: 2025-11-29 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'widen_payment_quiz_ids'
+down_revision = 'convert_api_analytics'
+branch_labels = None
+depends_on = None
+
+# Table -> columns that reference another table's id in this set. Parents come
+# before their children. user_id and course_id stay INTEGER because they point
+# at the Core users and courses tables, whose keys are still INTEGER.
+ID_TABLES = {
+    'orders': (),
+    'payments': ('order_id',),
+    'transactions': ('order_id',),
+    'coupons': (),
+    'quizzes': (),
+    'quiz_questions': ('quiz_id',),
+    'quiz_options': ('question_id',),
+    'quiz_attempts': ('quiz_id',),
+    'quiz_answers': ('attempt_id', 'question_id', 'selected_option_id'),
+}
+
+
+def upgrade():
+    # Fail fast instead of queueing behind long-running transactions
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+
+    # The SERIAL primary keys from add_payments and add_quiz_tables become
+    # BIGINT GENERATED BY DEFAULT AS IDENTITY (CACHE 100), and the columns
+    # pointing at them are widened to match. The type change rewrites each
+    # table once.
+    for table, references in ID_TABLES.items():
+        columns = ('id',) + references
+        op.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(f"ALTER COLUMN {column} TYPE BIGINT" for column in columns)
+        )
+        # Swap the serial sequence for an identity that continues after the
+        # highest existing id
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT")
+        op.execute(f"DROP SEQUENCE IF EXISTS {table}_id_seq")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (CACHE 100)")
+        op.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(max(id), 0) + 1, false) "
+            f"FROM {table}"
+        )
+
+
+def downgrade():
+    op.execute("SET lock_timeout = '3s'")
+    op.execute("SET statement_timeout = '300s'")
+
+    for table, references in reversed(list(ID_TABLES.items())):
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        columns = ('id',) + references
+        op.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(f"ALTER COLUMN {column} TYPE INTEGER" for column in columns)
+        )
+        op.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+        op.execute(
+            f"SELECT setval('{table}_id_seq', COALESCE(max(id), 0) + 1, false) FROM {table}"
+        )
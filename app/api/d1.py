@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.services.d1_service import create_message, list_messages, database
+from app.services.d1_service import create_message, list_messages
 
 router = APIRouter()
 
@@ -10,12 +10,6 @@ class MessageIn(BaseModel):
     video_id: str | None = None
 
 
-@router.on_event("startup")
-def _connect_db():
-    if not database._connected:
-        database.connect()
-
-
 @router.post("/d1/messages")
 def post_message(msg: MessageIn):
     try:
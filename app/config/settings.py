@@ -2,7 +2,8 @@ import os
 from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file. This is the only place .env is
+# read; every entry point (app, scripts, alembic) imports settings first.
 load_dotenv()
 
 
@@ -10,9 +11,36 @@ class Settings:
     # App
     FRONTEND_ORIGIN: str = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
     DEBUG: bool = os.getenv("DEBUG", "1") == "1"
+    # Use asyncio.eager_task_factory where available (Python 3.12+)
+    EAGER_TASKS: bool = os.getenv("EAGER_TASKS", "1") == "1"
+    
+    # Optional features (their routers aren't imported when disabled)
+    PAYMENT_ENABLED: bool = os.getenv("PAYMENT_ENABLED", "1") == "1"
+    ANALYTICS_ENABLED: bool = os.getenv("ANALYTICS_ENABLED", "0") == "1"
+    # Write analytics rows to the UNLOGGED api_analytics_staging table first
+    # (PostgreSQL only; each worker flushes it into api_analytics every 5 seconds)
+    ANALYTICS_STAGING: bool = os.getenv("ANALYTICS_STAGING", "0") == "1"
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
+    # Alembic at startup: sync (block until done), async (background task), skip
+    MIGRATION_MODE: str = os.getenv("MIGRATION_MODE", "skip")
+    # PostgreSQL connection budget: each worker process gets an equal share
+    # of DB_MAX_CONNECTIONS after DB_RESERVED_CONNECTIONS (migrations,
+    # background tasks, psql) are set aside. That share is split between the
+    # Core engine (d1_service) and the ORM engine (app.db.database), which
+    # gets DB_ORM_POOL_PERCENT of it. DB_POOL_SIZE / DB_MAX_OVERFLOW override
+    # the derived Core engine values.
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "4"))
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+    DB_RESERVED_CONNECTIONS: int = int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "0"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "-1"))
+    DB_ORM_POOL_PERCENT: int = int(os.getenv("DB_ORM_POOL_PERCENT", "25"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    # Shared cache across workers; leave empty to keep caches in-process
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
     
     # JWT & Auth
     SECRET_KEY: str = os.getenv("SECRET_KEY", "please-set-a-secure-secret-change-this-in-production")
@@ -50,6 +78,11 @@ class Settings:
     # Cloudflare Stream
     CF_ACCOUNT_ID: str = os.getenv("CF_ACCOUNT_ID", "")
     CF_STREAM_TOKEN: str = os.getenv("CF_STREAM_TOKEN", "")
+    
+    # Stripe Payment
+    STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
+    STRIPE_PUBLISHABLE_KEY: str = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
+    STRIPE_WEBHOOK_SECRET: str = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 
 
 
@@ -0,0 +1,178 @@
+"""
+Small in-process caches shared by the auth and service layers, plus an
+optional Redis tier so cached values are shared across workers
+"""
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Hashable, Optional
+import json
+import logging
+import threading
+import time
+
+from app.config.settings import settings
+
+try:
+    import redis
+except ImportError:  # Redis is optional; caches stay in-process without it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# After a Redis error, skip Redis for this long instead of paying a
+# connect timeout on every request
+REDIS_RETRY_SECONDS = 30
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a TTL.
+    
+    Endpoints are sync and run in FastAPI's threadpool, so access is guarded
+    by a threading.Lock rather than an asyncio.Lock.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value; `ttl` may shorten (never extend) the default TTL"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_redis_client = None
+_redis_retry_at = 0.0
+
+
+def get_redis():
+    """
+    Return the shared Redis client, or None when REDIS_URL is unset, the
+    redis package isn't installed, or Redis failed within the last
+    REDIS_RETRY_SECONDS.
+    """
+    global _redis_client
+    if redis is None or not settings.REDIS_URL or time.monotonic() < _redis_retry_at:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=0.05,
+            socket_connect_timeout=0.05,
+        )
+    return _redis_client
+
+
+def _redis_failed(e: Exception):
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    logger.warning(f"Redis unavailable, using in-process cache: {e}")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj: dict):
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+class RedisBackedCache:
+    """
+    Two-tier cache: a short-lived in-process TTLCache in front of Redis.
+    
+    Values must be JSON-serializable (datetimes and dates round-trip).
+    pop() clears both tiers, so writes invalidate across workers; other
+    workers may still serve their local copy for up to `local_ttl` seconds.
+    Any Redis error falls back to the in-process tier alone.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, local_ttl: float = 5):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=min(ttl, local_ttl))
+
+    def _key(self, key: Hashable) -> str:
+        return f"lms:{self.namespace}:{key}"
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        client = get_redis()
+        if client is None:
+            return default
+        try:
+            raw = client.get(self._key(key))
+        except redis.RedisError as e:
+            _redis_failed(e)
+            return default
+        if raw is None:
+            return default
+        value = json.loads(raw, object_hook=_json_object_hook)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value in both tiers; `ttl` may shorten the default TTL"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.local.set(key, value, ttl=ttl)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            client.set(self._key(key), json.dumps(value, default=_json_default), ex=max(1, int(ttl)))
+        except redis.RedisError as e:
+            _redis_failed(e)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.pop(key, default)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self._key(key))
+            except redis.RedisError as e:
+                _redis_failed(e)
+        return value
@@ -1,51 +1,4 @@
-import os
-from dotenv import load_dotenv
+# Kept for existing imports; all settings live in app.config.settings
+from app.config.settings import Settings, get_settings, settings
 
-load_dotenv()
-
-
-class Settings:
-    # Application
-    APP_NAME: str = "LMS Platform"
-    APP_VERSION: str = "1.0.0"
-    
-    # Database
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
-    
-    # Security
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    
-    # CORS
-    FRONTEND_ORIGIN: str = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
-    
-    # AWS S3 / R2
-    R2_ENDPOINT: str = os.getenv("R2_ENDPOINT", "")
-    R2_ACCESS_KEY: str = os.getenv("R2_ACCESS_KEY", "")
-    R2_SECRET_KEY: str = os.getenv("R2_SECRET_KEY", "")
-    R2_BUCKET: str = os.getenv("R2_BUCKET", "")
-    
-    # Cloudflare Stream
-    CF_ACCOUNT_ID: str = os.getenv("CF_ACCOUNT_ID", "")
-    CF_STREAM_TOKEN: str = os.getenv("CF_STREAM_TOKEN", "")
-    
-    # Email
-    SMTP_HOST: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
-    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
-    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
-    SMTP_FROM_EMAIL: str = os.getenv("SMTP_FROM_EMAIL", "noreply@lms.com")
-    
-    # Stripe Payment
-    STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
-    STRIPE_PUBLISHABLE_KEY: str = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
-    STRIPE_WEBHOOK_SECRET: str = os.getenv("STRIPE_WEBHOOK_SECRET", "")
-    
-    # Admin
-    ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL", "admin@example.com")
-    ADMIN_PASSWORD: str = os.getenv("ADMIN_PASSWORD", "admin123")
-
-
-settings = Settings()
+__all__ = ["Settings", "get_settings", "settings"]
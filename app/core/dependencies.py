@@ -1,13 +1,81 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.jwt import decode_token
+from app.core.cache import RedisBackedCache
 from app.services.d1_service import database
+from app.services.batcher import permission_batcher
+from app.services.permission_service import permission_service
 from app import models
 from typing import Optional
 from types import SimpleNamespace
+from functools import lru_cache
+from sqlalchemy import bindparam, select
 import json
+import logging
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; stdlib json parses the same input
+    _json_loads = json.loads
 
 security = HTTPBearer()
+logger = logging.getLogger("lms.auth")
+
+# user_id -> users row, so back-to-back requests from the same user skip the
+# SELECT. Shared through Redis when REDIS_URL is set, so public pages served
+# by any worker recognize a logged-in user without a database round trip.
+# Call invalidate_user() after any write to the users row.
+user_cache = RedisBackedCache("auth_user", maxsize=10_000, ttl=30)
+
+# Columns cached for authenticated users. Secrets (hashed_password,
+# two_factor_secret) are never written to the shared cache; endpoints that
+# verify a password refetch the full row.
+_AUTH_USER_COLUMNS = (
+    "id", "email", "full_name", "is_active", "is_verified", "role", "consent",
+    "two_factor_enabled", "profile_picture", "oauth_provider", "oauth_provider_id",
+    "created_at", "updated_at", "last_login",
+)
+_USER_BY_ID = select(
+    *(models.users.c[name] for name in _AUTH_USER_COLUMNS)
+).where(models.users.c.id == bindparam("user_id"))
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a user from the auth cache after their row changes"""
+    try:
+        user_cache.pop(int(user_id), None)
+    except (TypeError, ValueError):
+        pass
+
+
+def _load_user(user_id: int) -> Optional[dict]:
+    """Fetch a users row through user_cache"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = database.fetch_one(_USER_BY_ID, {"user_id": user_id})
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    # Hand out a copy so callers can't mutate the cached row
+    return dict(user)
+
+
+@lru_cache(maxsize=16)
+def _env_admin_user(email: Optional[str]) -> SimpleNamespace:
+    """Synthetic user object for env-based admin, built once per admin email"""
+    return SimpleNamespace(
+        id=0,
+        email=email,
+        role="admin",
+        is_active=True,
+        is_verified=True,
+        full_name="Admin User",
+        created_at=None,
+        consent=True,
+        hashed_password=None,
+        last_login=None
+    )
 
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -15,13 +83,10 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     Dependency to get current authenticated user from JWT token.
     Raises 401 if token is invalid or user not found.
     """
-    import logging
-    logger = logging.getLogger("lms.auth")
-    
     token = credentials.credentials
     payload = decode_token(token)
     
-    logger.info(f"get_current_user: decoded payload = {payload}")
+    logger.debug("get_current_user: decoded payload = %r", payload)
     
     if not payload or payload.get("type") != "access":
         raise HTTPException(
@@ -31,7 +96,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         )
     
     user_id = payload.get("sub")
-    logger.info(f"get_current_user: user_id = {user_id}, type = {type(user_id)}")
+    logger.debug("get_current_user: user_id = %r", user_id)
     
     if not user_id:
         raise HTTPException(
@@ -43,24 +108,10 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     if user_id == "0" or user_id == 0:
         # Check if this is admin from JWT
         if payload.get("role") == "admin":
-            logger.info("get_current_user: returning env-based admin user")
-            # Return a synthetic user object for env-based admin
-            return SimpleNamespace(
-                id=0,
-                email=payload.get("email"),
-                role="admin",
-                is_active=True,
-                is_verified=True,
-                full_name="Admin User",
-                created_at=None,
-                consent=True,
-                hashed_password=None,
-                last_login=None
-            )
+            logger.debug("get_current_user: returning env-based admin user")
+            return _env_admin_user(payload.get("email"))
     
-    user = database.fetch_one(
-        models.users.select().where(models.users.c.id == int(user_id))
-    )
+    user = _load_user(int(user_id))
     
     if not user:
         raise HTTPException(
@@ -89,8 +140,13 @@ def get_current_verified_user(current_user = Depends(get_current_user)):
     return current_user
 
 
+@lru_cache(maxsize=32)
 def require_role(role: str):
-    """Factory function to create role-based dependencies"""
+    """
+    Factory function to create role-based dependencies.
+    Cached so every route asking for the same role shares one dependency
+    callable, which FastAPI can then de-duplicate per request.
+    """
     def check_role(current_user = Depends(get_current_user)):
         # Handle both dict and SimpleNamespace
         user_role = current_user.get("role") if isinstance(current_user, dict) else current_user.role
@@ -115,52 +171,56 @@ def require_admin(current_user = Depends(get_current_user)):
     return current_user
 
 
-def require_permission(permission: str, current_user = Depends(get_current_user)):
-    """Check if user has specific permission through role, group, or user-level"""
-    # Handle both dict and SimpleNamespace
-    user_role = current_user.get("role") if isinstance(current_user, dict) else current_user.role
-    user_id = current_user.get("id") if isinstance(current_user, dict) else current_user.id
-    
-    # Admin has all permissions
-    if user_role == "admin":
-        return current_user
-    
-    # Check role permissions
-    role = database.fetch_one(
-        models.roles.select().where(models.roles.c.name == user_role)
-    )
-    if role:
-        role_perms = json.loads(role.permissions) if isinstance(role.permissions, str) else role.permissions
-        if "all" in role_perms or permission in role_perms:
+@lru_cache(maxsize=1024)
+def _parse_permissions(raw: str) -> frozenset:
+    """Parse a stored permissions JSON array once per distinct value"""
+    try:
+        return frozenset(_json_loads(raw) or ())
+    except (ValueError, TypeError):
+        return frozenset()
+
+
+def _permission_set(raw) -> frozenset:
+    if isinstance(raw, str):
+        return _parse_permissions(raw)
+    return frozenset(raw or ())
+
+
+@lru_cache(maxsize=64)
+def require_permission(permission: str):
+    """
+    Factory function to create permission-based dependencies, granted through
+    role, group, or user-level permissions. Cached like require_role.
+    """
+    def check_permission(current_user = Depends(get_current_user)):
+        # Handle both dict and SimpleNamespace
+        user_role = current_user.get("role") if isinstance(current_user, dict) else current_user.role
+        user_id = current_user.get("id") if isinstance(current_user, dict) else current_user.id
+        
+        # Admin has all permissions
+        if user_role == "admin":
             return current_user
-    
-    # Check user-level permissions
-    user_perm = database.fetch_one(
-        models.user_permissions.select().where(
-            models.user_permissions.c.user_id == user_id,
-            models.user_permissions.c.permission == permission
-        )
-    )
-    if user_perm:
-        return current_user
-    
-    # Check group permissions
-    user_groups = database.fetch_all(
-        models.user_groups.select().where(models.user_groups.c.user_id == user_id)
-    )
-    for ug in user_groups:
-        group = database.fetch_one(
-            models.groups.select().where(models.groups.c.id == ug.group_id)
-        )
-        if group:
-            group_perms = json.loads(group.permissions) if isinstance(group.permissions, str) else group.permissions
-            if "all" in group_perms or permission in group_perms:
+        
+        # Bits granting this permission; unregistered names can only come via "all"
+        mask = permission_service.get_permission_bit(permission) | permission_service.get_permission_bit("all")
+        
+        # Role, user-level and group permissions, coalesced with concurrent checks
+        for row in permission_batcher.get_role_and_user_perms(user_id, user_role):
+            if row["perm_bits"] is not None:
+                if row["perm_bits"] & mask:
+                    return current_user
+            # Rows not yet backfilled by migrate_permission_bits.py use the JSON lists
+            elif row["source"] == "user":
+                if row["permissions"] == permission:
+                    return current_user
+            elif _permission_set(row["permissions"]) & {"all", permission}:
                 return current_user
-    
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail=f"Permission '{permission}' required"
-    )
+        
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Permission '{permission}' required"
+        )
+    return check_permission
 
 
 def get_optional_user(request: Request) -> Optional[dict]:
@@ -179,7 +239,4 @@ def get_optional_user(request: Request) -> Optional[dict]:
     if not user_id:
         return None
     
-    user = database.fetch_one(
-        models.users.select().where(models.users.c.id == int(user_id))
-    )
-    return user
+    return _load_user(int(user_id))
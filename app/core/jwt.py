@@ -1,9 +1,40 @@
-from datetime import datetime, timedelta
 from app.config.settings import settings
-import secrets
+from app.core.cache import TTLCache
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
 
 ALGORITHM = "HS256"
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # orjson is optional
+    _json_loads = json.loads
+
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode()
+
+# Decoded payloads keyed by SHA-256 of the raw token, so repeat requests with
+# the same token skip signature verification. Entries live at most 60 seconds
+# and never past the token's own exp.
+_decode_cache = TTLCache(maxsize=4096, ttl=60)
+
+# Keyed HS256 state built once; each verification copies it instead of
+# re-deriving the padded key blocks from SECRET_KEY.
+_HMAC_PROTOTYPE = hmac.new(settings.SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+# Claims the fast path doesn't validate; tokens carrying them go through the library
+_UNCHECKED_CLAIMS = frozenset(("nbf", "iat", "aud", "iss"))
+
 # Prefer python-jose but fall back to PyJWT if jose isn't available.
 try:
     from jose import jwt as jose_jwt, JWTError as JoseError
@@ -35,15 +66,28 @@ except Exception:
         _jwt_exc = Exception
 
 
+# Per-thread pool of urandom bytes for JTIs: one 4 KiB read serves 256 tokens
+_JTI_BYTES = 16
+_URANDOM_BATCH = 4096
+_jti_state = threading.local()
+
+
+def _fast_jti() -> str:
+    state = _jti_state
+    pos = getattr(state, "pos", _URANDOM_BATCH)
+    # Refill when exhausted, and after a fork so workers never share bytes
+    if pos >= _URANDOM_BATCH or state.pid != os.getpid():
+        state.buf = os.urandom(_URANDOM_BATCH)
+        state.pid = os.getpid()
+        pos = 0
+    state.pos = pos + _JTI_BYTES
+    return base64.urlsafe_b64encode(state.buf[pos:pos + _JTI_BYTES]).rstrip(b"=").decode()
+
+
 def _make_payload(subject: str, typ: str, expires_delta: int | None, extra_claims: dict | None = None):
-    now = datetime.utcnow()
-    if expires_delta:
-        exp = now + timedelta(seconds=expires_delta)
-    else:
-        exp = now + (timedelta(minutes=15) if typ == 'access' else timedelta(days=7))
-    # Use a consistent timestamp calculation
-    exp_timestamp = int((exp - datetime(1970, 1, 1)).total_seconds())
-    payload = {"sub": str(subject), "exp": exp_timestamp, "type": typ, "jti": secrets.token_urlsafe(16)}
+    now_ts = int(time.time())
+    exp_ts = now_ts + (expires_delta or (900 if typ == 'access' else 604800))
+    payload = {"sub": str(subject), "exp": exp_ts, "type": typ, "jti": _fast_jti()}
     if extra_claims:
         payload.update(extra_claims)
     return payload
@@ -51,27 +95,19 @@ def _make_payload(subject: str, typ: str, expires_delta: int | None, extra_claim
 
 def create_access_token(subject: str, expires_delta: int | None = None, extra_claims: dict | None = None):
     """Create JWT access token for user authentication"""
-    payload = _make_payload(subject, 'access', expires_delta, extra_claims)
-    if not _encode:
-        raise RuntimeError("No JWT library available. Install 'python-jose' or 'PyJWT'.")
-    return _encode(payload)
+    return _fast_encode(_make_payload(subject, 'access', expires_delta, extra_claims))
 
 
 def create_refresh_token(subject: str, expires_delta: int | None = None, extra_claims: dict | None = None):
     """Create JWT refresh token for token renewal"""
-    payload = _make_payload(subject, 'refresh', expires_delta, extra_claims)
-    if not _encode:
-        raise RuntimeError("No JWT library available. Install 'python-jose' or 'PyJWT'.")
-    return _encode(payload)
+    return _fast_encode(_make_payload(subject, 'refresh', expires_delta, extra_claims))
 
 
 def create_verification_token(subject: str = None, user_id: int = None):
     """Create token for email verification"""
     # Support both 'subject' and 'user_id' parameters for backward compatibility
     sub = str(subject) if subject is not None else str(user_id)
-    exp = datetime.utcnow() + timedelta(hours=24)
-    exp_timestamp = int((exp - datetime(1970, 1, 1)).total_seconds())
-    payload = {"sub": sub, "exp": exp_timestamp, "type": "email_verify"}
+    payload = {"sub": sub, "exp": int(time.time()) + 24 * 3600, "type": "email_verify"}
     if not _encode:
         raise RuntimeError("No JWT library available.")
     return _encode(payload)
@@ -81,23 +117,116 @@ def create_reset_token(subject: str = None, user_id: int = None):
     """Create token for password reset"""
     # Support both 'subject' and 'user_id' parameters for backward compatibility
     sub = str(subject) if subject is not None else str(user_id)
-    exp = datetime.utcnow() + timedelta(hours=1)
-    exp_timestamp = int((exp - datetime(1970, 1, 1)).total_seconds())
-    payload = {"sub": sub, "exp": exp_timestamp, "type": "password_reset"}
+    payload = {"sub": sub, "exp": int(time.time()) + 3600, "type": "password_reset"}
     if not _encode:
         raise RuntimeError("No JWT library available.")
     return _encode(payload)
 
 
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _fast_verify(token: str):
+    """
+    Verify an HS256 token without going through the JWT library.
+    Returns the payload only when the token is definitely valid; anything
+    else (other algorithm, malformed, bad signature, expired, extra claims)
+    returns None so the caller falls back to the library decode.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        if header.get("alg") != ALGORITHM:
+            return None
+        mac = _HMAC_PROTOTYPE.copy()
+        mac.update(f"{header_b64}.{payload_b64}".encode())
+        if not hmac.compare_digest(mac.digest(), _b64url_decode(signature_b64)):
+            return None
+        payload = json.loads(_b64url_decode(payload_b64))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not isinstance(payload, dict) or _UNCHECKED_CLAIMS & payload.keys():
+        return None
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        return None
+    return payload
+
+
+# Header segment of every token this module issues (jose and PyJWT both
+# serialize it with sorted keys and compact separators)
+_HEADER_B64 = base64.urlsafe_b64encode(
+    json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode()
+).rstrip(b"=").decode()
+_HEADER_PREFIX = _HEADER_B64 + "."
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _fast_encode(payload: dict) -> str:
+    """
+    Sign an HS256 token without going through the JWT library: the header
+    segment is precomputed and the keyed HMAC state is copied from
+    _HMAC_PROTOTYPE, so only the payload is encoded per token. The result
+    is a standard JWS that jose/PyJWT decode as usual.
+    """
+    signing_input = _HEADER_PREFIX + _b64url_encode(_json_dumps(payload))
+    mac = _HMAC_PROTOTYPE.copy()
+    mac.update(signing_input.encode())
+    return signing_input + "." + _b64url_encode(mac.digest())
+
+
+def _decode_access(token: str):
+    """
+    _fast_verify specialized for tokens issued here: the header segment is
+    known, so it is matched by prefix instead of being decoded and parsed.
+    Same contract: the payload when definitely valid, otherwise None.
+    """
+    try:
+        signing_input, signature_b64 = token.rsplit(".", 1)
+        mac = _HMAC_PROTOTYPE.copy()
+        mac.update(signing_input.encode())
+        if not hmac.compare_digest(mac.digest(), _b64url_decode(signature_b64)):
+            return None
+        payload = _json_loads(_b64url_decode(signing_input[len(_HEADER_PREFIX):]))
+        if _UNCHECKED_CLAIMS & payload.keys() or payload["exp"] <= time.time():
+            return None
+    except (ValueError, TypeError, AttributeError, KeyError):
+        return None
+    return payload
+
+
+def _cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
 def decode_token(token: str):
     """Decode and validate JWT token"""
     if not _decode:
         return None
-    try:
-        return _decode(token)
-    except _jwt_exc as e:
-        # Add logging to debug token decode issues
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"JWT decode error: {e}")
-        return None
+    key = _cache_key(token)
+    cached = _decode_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+    if token.startswith(_HEADER_PREFIX):
+        payload = _decode_access(token)
+    else:
+        payload = _fast_verify(token)
+    if payload is None:
+        try:
+            payload = _decode(token)
+        except _jwt_exc as e:
+            # Add logging to debug token decode issues
+            logger.error(f"JWT decode error: {e}")
+            return None
+    exp = payload.get("exp")
+    _decode_cache.set(key, payload, ttl=exp - time.time() if isinstance(exp, (int, float)) else None)
+    return dict(payload)
+
+
+def invalidate_token(token: str):
+    """Drop a token's cached payload, e.g. once a single-use token is consumed"""
+    _decode_cache.pop(_cache_key(token))
@@ -2,6 +2,16 @@ import os
 import hmac
 import hashlib
 import base64
+import ssl
+import logging
+import threading
+from app.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# hashlib.pbkdf2_hmac runs the whole iteration loop inside OpenSSL, which
+# uses SHA extensions (SHA-NI) where the CPU has them
+logger.info(f"Password hashing backed by {ssl.OPENSSL_VERSION}")
 
 try:
     from passlib.context import CryptContext
@@ -9,10 +19,10 @@ try:
     # Use argon2 instead of bcrypt for better security
     pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
-    def hash_password(password: str) -> str:
+    def _hash_password(password: str) -> str:
         return pwd_context.hash(password)
 
-    def verify_password(plain: str, hashed: str) -> bool:
+    def _verify_password(plain: str, hashed: str) -> bool:
         return pwd_context.verify(plain, hashed)
 
 except Exception:
@@ -23,13 +33,13 @@ except Exception:
     def _pbkdf2_hash(password: str, salt: bytes, iterations: int = DEFAULT_PBKDF2_ITERATIONS) -> bytes:
         return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
 
-    def hash_password(password: str) -> str:
+    def _hash_password(password: str) -> str:
         salt = os.urandom(16)
         iterations = DEFAULT_PBKDF2_ITERATIONS
         dk = _pbkdf2_hash(password, salt, iterations)
         return f"pbkdf2_sha256${iterations}${base64.b64encode(salt).decode()}${base64.b64encode(dk).decode()}"
 
-    def verify_password(plain: str, hashed: str) -> bool:
+    def _verify_password(plain: str, hashed: str) -> bool:
         try:
             parts = hashed.split('$')
             if len(parts) != 4 or parts[0] != 'pbkdf2_sha256':
@@ -42,3 +52,38 @@ except Exception:
             return hmac.compare_digest(computed, dk)
         except Exception:
             return False
+
+
+# Hashing is CPU-bound and both argon2 and pbkdf2_hmac release the GIL, so
+# the sync endpoints calling these already run in parallel worker threads.
+# Cap them at one hash per core so a burst of logins or resets can't
+# oversubscribe the CPU and slow down every other request.
+_hash_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+
+def hash_password(password: str) -> str:
+    with _hash_slots:
+        return _hash_password(password)
+
+
+# Successful verifications from the last minute, so a burst of logins with
+# the same credentials hashes once. Keys are HMACs under a per-process
+# secret, so they are useless outside this process, and a password change
+# produces a new hash (new salt) that never matches an old entry. Failures
+# are never cached, so guessing still pays the full hashing cost.
+_verified_cache = TTLCache(maxsize=1024, ttl=60)
+_verified_cache_key = os.urandom(32)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    if not hashed:
+        return False
+    key = hmac.new(_verified_cache_key, f"{hashed}\0{plain}".encode("utf-8"), hashlib.sha256).digest()
+    if _verified_cache.get(key):
+        return True
+    with _hash_slots:
+        verified = _verify_password(plain, hashed)
+    if verified:
+        _verified_cache.set(key, True)
+        return True
+    return False
@@ -6,6 +6,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
 
+try:
+    import orjson
+
+    def _json_serializer(data) -> str:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:  # orjson is optional; SQLAlchemy defaults to json.dumps
+    _json_serializer = None
+
 # Create declarative base for ORM models (doesn't require DB connection)
 Base = declarative_base()
 
@@ -14,6 +22,42 @@ engine = None
 SessionLocal = None
 
 
+def worker_connection_budget() -> tuple[int, int]:
+    """
+    Split this worker's share of the PostgreSQL connection budget between the
+    Core engine (app.services.d1_service) and the ORM engine below.
+    
+    Returns (core_connections, orm_connections). Each engine keeps
+    pool_size + max_overflow within its part, so every worker at full
+    overflow stays under DB_MAX_CONNECTIONS.
+    """
+    budget = max(
+        4,
+        (settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS) // max(1, settings.WEB_CONCURRENCY),
+    )
+    orm_connections = max(2, budget * settings.DB_ORM_POOL_PERCENT // 100)
+    return budget - orm_connections, orm_connections
+
+
+# Pool sizing for server databases, from the ORM engine's part of the
+# connection budget (analytics batches and payments). Pre-ping and recycle
+# drop connections the server or a proxy has closed before a request gets
+# handed one; pool_timeout fails fast instead of queueing indefinitely.
+_ORM_CONNECTIONS = worker_connection_budget()[1]
+_ORM_POOL_SIZE = min(10, _ORM_CONNECTIONS)
+POOL_OPTIONS = {
+    "pool_size": _ORM_POOL_SIZE,
+    "max_overflow": _ORM_CONNECTIONS - _ORM_POOL_SIZE,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    "connect_args": {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+}
+
+# JSON/JSONB columns (analytics payloads) are serialized with orjson when
+# it is installed
+ENGINE_OPTIONS = {"json_serializer": _json_serializer} if _json_serializer else {}
+
 def init_db():
     """Initialize database engine and session factory"""
     global engine, SessionLocal
@@ -28,10 +72,28 @@ def init_db():
     if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
         engine = create_engine(
             SQLALCHEMY_DATABASE_URL,
-            connect_args={"check_same_thread": False}
+            connect_args={"check_same_thread": False},
+            **ENGINE_OPTIONS,
+        )
+    elif SQLALCHEMY_DATABASE_URL.startswith("postgresql+psycopg://"):
+        # psycopg3 batches writes through libpq pipeline mode instead
+        # (see AnalyticsService.log_api_calls)
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URL,
+            insertmanyvalues_page_size=500,
+            **POOL_OPTIONS,
+            **ENGINE_OPTIONS,
         )
     else:
-        engine = create_engine(SQLALCHEMY_DATABASE_URL)
+        # Send executemany batches (e.g. buffered analytics rows) as multi-row
+        # INSERT ... VALUES pages instead of one round trip per row
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URL,
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=500,
+            **POOL_OPTIONS,
+            **ENGINE_OPTIONS,
+        )
     
     # Create session factory
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,6 +1,4 @@
-from dotenv import load_dotenv
-load_dotenv()
-
+import importlib
 import logging
 import time
 import asyncio
@@ -9,52 +7,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config.settings import settings
 
-# Import routers after settings (and after loading .env) so settings pick up env values
+# Import routers after settings (which loads .env) so settings pick up env values
 from app.api import hello, r2, d1, stream
 from app.services import d1_service
-from app.services.admin_bootstrap import bootstrap_admin
+from app.db import database as orm_database
+from app.tasks.migrations import migration_state, run_migrations_async
 from app.routers import auth as auth_router
 from app.routers import gdpr as gdpr_router
 from app.routers import profile as profile_router
-try:
-    from app.routers import admin as admin_router
-except Exception:
-    admin_router = None
-try:
-    from app.routers import admin_auth as admin_auth_router
-except Exception:
-    admin_auth_router = None
-try:
-    print(">>> Attempting to import content router...")
-    from app.routers import content as content_router
-    print(f">>> content_router loaded successfully!")
-    print(f">>> Total routes in content_router: {len(content_router.router.routes)}")
-    public_routes = [r.path for r in content_router.router.routes if 'public' in r.path]
-    print(f">>> Public routes: {public_routes}")
-except Exception as e:
-    print(f">>> ERROR loading content_router: {e}")
-    import traceback
-    traceback.print_exc()
-    content_router = None
-
-try:
-    from app.routers import payment as payment_router
-except Exception as e:
-    print(f">>> ERROR loading payment_router: {e}")
-    payment_router = None
-
-try:
-    from app.routers import analytics as analytics_router
-except Exception as e:
-    print(f">>> ERROR loading analytics_router: {e}")
-    analytics_router = None
-
-try:
-    from app.routers import quiz as quiz_router
-except Exception as e:
-    print(f">>> ERROR loading quiz_router: {e}")
-    quiz_router = None
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("lms.backend")
 
@@ -102,44 +62,61 @@ app.include_router(auth_router.router, prefix="/api/auth")
 # Profile router
 app.include_router(profile_router.router, prefix="/api/profile")
 
-# Admin Auth router (env-based authentication)
-if admin_auth_router is not None:
-    app.include_router(admin_auth_router.router, prefix="/api/admin/auth")
-
 # GDPR router
 app.include_router(gdpr_router.router, prefix="/api/gdpr")
 
-# Admin router (optional)
-if admin_router is not None:
-    app.include_router(admin_router.router, prefix="/api/admin")
+# Optional routers: (module under app.routers, prefix, enabled). Disabled
+# routers are never imported, so they cost nothing at startup. A router that
+# fails to import is logged and skipped rather than taking the app down.
+OPTIONAL_ROUTERS = [
+    # Admin Auth router (env-based authentication); before /api/admin
+    ("admin_auth", "/api/admin/auth", True),
+    ("admin", "/api/admin", True),
+    # Courses and blogs - includes both /admin/... and /public/... routes
+    ("content", "/api", True),
+    ("payment", "", settings.PAYMENT_ENABLED),
+    ("quiz", "", True),
+    # Analytics feature consumes significant resources
+    ("analytics", "", settings.ANALYTICS_ENABLED),
+]
+
+for name, prefix, enabled in OPTIONAL_ROUTERS:
+    if not enabled:
+        continue
+    try:
+        module = importlib.import_module(f"app.routers.{name}")
+    except Exception as e:
+        print(f">>> ERROR loading {name} router: {e}")
+        import traceback
+        traceback.print_exc()
+        continue
+    app.include_router(module.router, prefix=prefix)
+    print(f">>> {name} router registered")
+
 
-# Content router (courses and blogs - includes both /admin and /public routes)
-if content_router is not None:
-    # Register with /api prefix - routes in content.py have /admin/... and /public/... prefixes
-    app.include_router(content_router.router, prefix="/api")
-    print(">>> Content router registered with /api/admin/* and /api/public/* routes")
+# Tasks started at startup; held here so the event loop's weak references
+# aren't the only thing keeping them alive
+_background_tasks = set()
 
-# Payment router
-if payment_router is not None:
-    app.include_router(payment_router.router)
-    print(">>> Payment router registered")
 
-# Quiz router
-if quiz_router is not None:
-    app.include_router(quiz_router.router)
-    print(">>> Quiz router registered")
+def _start_background_task(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-# Analytics router
-# DISABLED: Analytics feature consumes significant resources
-# if analytics_router is not None:
-#     app.include_router(analytics_router.router)
-#     print(">>> Analytics router registered")
 
 @app.on_event("startup")
 async def startup_event():
     # run D1 migrations or initial checks
     logger.info("startup_event: starting init_db")
     t0 = time.time()
+    
+    # Python 3.12+: run new tasks eagerly up to their first await, so tasks
+    # that finish without suspending never get scheduled on the loop
+    if settings.EAGER_TASKS and hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+        logger.info("startup_event: eager task factory enabled")
 
     '''
     try:
@@ -150,13 +127,50 @@ async def startup_event():
         logger.info("startup_event: init_db completed in %.3f sec", time.time() - t0)
     '''
     
+    # Apply Alembic migrations according to MIGRATION_MODE
+    if settings.MIGRATION_MODE == "async":
+        logger.info("startup_event: running migrations in the background")
+        _start_background_task(run_migrations_async())
+    elif settings.MIGRATION_MODE == "sync":
+        logger.info("startup_event: running migrations")
+        await run_migrations_async()
+    else:
+        migration_state["status"] = "skipped"
+    
+    # Build the ORM engine now and open one connection so the first
+    # request doesn't pay for engine creation and the connect handshake
+    logger.info("startup_event: warming ORM connection pool")
+    try:
+        orm_database.init_db().connect().close()
+    except Exception as e:
+        logger.exception("startup_event: ORM pool warm-up failed: %s", e)
+    
     # Bootstrap admin user from .env
     logger.info("startup_event: bootstrapping admin user")
     try:
+        from app.services.admin_bootstrap import bootstrap_admin
         bootstrap_admin()
     except Exception as e:
         logger.exception("startup_event: bootstrap_admin failed: %s", e)
     
+    # Create upcoming api_analytics partitions once a day
+    if settings.DATABASE_URL.startswith("postgresql"):
+        logger.info("startup_event: starting analytics partition maintenance")
+        try:
+            from app.tasks.analytics_partitions import ensure_analytics_partitions
+            _start_background_task(run_periodic_task(ensure_analytics_partitions, 24 * 60 * 60))
+        except Exception as e:
+            logger.exception("startup_event: analytics partition maintenance failed to start: %s", e)
+    
+    # Move staged analytics rows into api_analytics every few seconds
+    if settings.ANALYTICS_STAGING and settings.DATABASE_URL.startswith("postgresql"):
+        logger.info("startup_event: starting analytics staging flusher")
+        try:
+            from app.tasks.analytics_staging import flush_analytics_staging
+            _start_background_task(run_periodic_task(flush_analytics_staging, 5))
+        except Exception as e:
+            logger.exception("startup_event: analytics staging flusher failed to start: %s", e)
+    
     # Start background scheduler for auto-publishing blogs
     logger.info("startup_event: starting blog scheduler")
     # Temporarily disabled for debugging
@@ -167,6 +181,22 @@ async def startup_event():
     #     logger.exception("startup_event: blog scheduler failed to start: %s", e)
 
 
+@app.get("/health/migrations")
+def migrations_health():
+    """Report the state of startup migrations for readiness checks"""
+    return migration_state
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled connections held by the shared engine
+    logger.info("shutdown_event: disposing database connection pool")
+    d1_service.engine.dispose()
+    d1_service.write_engine.dispose()
+    if orm_database.engine is not None:
+        orm_database.engine.dispose()
+
+
 async def run_blog_scheduler(check_func):
     """Run the blog scheduler in the background"""
     while True:
@@ -175,3 +205,13 @@ async def run_blog_scheduler(check_func):
         except Exception as e:
             logger.error(f"Blog scheduler error: {e}")
         await asyncio.sleep(60)  # Check every minute
+
+
+async def run_periodic_task(func, interval: float):
+    """Run a blocking maintenance function in a worker thread every `interval` seconds"""
+    while True:
+        try:
+            await asyncio.to_thread(func)
+        except Exception as e:
+            logger.error(f"{func.__name__} error: {e}")
+        await asyncio.sleep(interval)
@@ -1,20 +1,62 @@
+import ipaddress
+import re
 import time
 import json
-from typing import Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from functools import lru_cache
+from typing import ClassVar, Dict, Optional
+from urllib.parse import parse_qsl
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from sqlalchemy.orm import Session
 from app.database import get_session_local
 from app.services.analytics_service import AnalyticsService
+from app.core.cache import TTLCache
 import logging
 import asyncio
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; stdlib json parses the same input
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+@lru_cache(maxsize=512)
+def _header_name(raw: bytes) -> str:
+    """Decoded header name, shared across requests instead of re-decoded"""
+    return raw.decode("latin-1")
+
+# A whole path segment that is all digits (group 1) or UUID-shaped: 36
+# characters with dashes at positions 8, 13, 18 and 23
+_DYNAMIC_SEGMENT_RE = re.compile(
+    r"(?<=/)(?:(\d+)|[^/]{8}-[^/]{4}-[^/]{4}-[^/]{4}-[^/]{12})(?=/|$)"
+)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_ip(value: str) -> Optional[str]:
+    """Validated, compressed IP string (stored as INET), or None"""
+    try:
+        return ipaddress.ip_address(value).compressed
+    except ValueError:
+        return None
+
 
-class APIAnalyticsMiddleware(BaseHTTPMiddleware):
-    """Middleware to automatically track all API requests"""
+def _segment_placeholder(match: "re.Match") -> str:
+    return "{id}" if match.group(1) else "{uuid}"
+
+
+class APIAnalyticsMiddleware:
+    """
+    Middleware to automatically track all API requests
+    
+    Pure ASGI rather than BaseHTTPMiddleware: response messages are passed
+    straight through to the server (no extra task, no Response rebuild),
+    and only the first few KB of request/error bodies are copied aside.
+    """
     
     # Endpoints to exclude from analytics (to prevent noise)
     EXCLUDED_PATHS = {
@@ -33,36 +75,86 @@ class APIAnalyticsMiddleware(BaseHTTPMiddleware):
         "/api/payments/",
         "/api/enrollment/",
     }
+    
+    # Headers never stored with analytics (raw ASGI names are lowercase bytes)
+    SENSITIVE_HEADERS: ClassVar[frozenset] = frozenset((
+        b"authorization",
+        b"cookie",
+        b"x-api-key",
+        b"x-auth-token",
+    ))
+    
+    # Capture limits for request bodies and error response bodies
+    MAX_REQUEST_BODY = 10000
+    BODY_METHODS = frozenset(("POST", "PUT", "PATCH"))
+    MAX_ERROR_BODY = 5000
+    
+    # Buffered rows are written in batches of up to BATCH_SIZE, at most
+    # FLUSH_INTERVAL seconds after the first row of a batch arrives. When
+    # the queue is full new rows are dropped rather than slowing requests.
+    QUEUE_SIZE = 10000
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 0.25
+    
+    # Geolocation results per IP; failed lookups are cached for less time
+    GEO_CACHE_SIZE = 50_000
+    GEO_CACHE_TTL = 600
+    GEO_NEGATIVE_TTL = 60
+    
+    # Errors and requests slower than SLOW_REQUEST_US are always logged; the
+    # rest are sampled 1:N, with N doubled while the queue is over
+    # SAMPLE_HIGH_WATER full and halved back towards 1 once it drains
+    SLOW_REQUEST_US = 500_000
+    SAMPLE_HIGH_WATER = 0.8
+    MAX_SAMPLE_RATE = 1024
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
+        # str.startswith accepts a tuple and checks every prefix in C
+        self._excluded = tuple(self.EXCLUDED_PATHS)
+        self._geo_prefixes = tuple(self.TRACK_GEOLOCATION_PATHS)
         self.geolocation_service = None
         try:
             from app.services.geolocation_service import GeolocationService
             self.geolocation_service = GeolocationService()
         except Exception as e:
             logger.warning(f"Geolocation service not available: {e}")
+        
+        self._geo_cache = TTLCache(maxsize=self.GEO_CACHE_SIZE, ttl=self.GEO_CACHE_TTL)
+        self._geo_inflight: Dict[str, asyncio.Future] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._consumer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self._counter = 0
+        self._sample_rate = 1
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process each request and log analytics"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
         
         # Skip excluded paths
-        if any(request.url.path.startswith(excluded) for excluded in self.EXCLUDED_PATHS):
-            return await call_next(request)
+        if path.startswith(self._excluded):
+            await self.app(scope, receive, send)
+            return
 
         # Start timing
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         # Extract request information
-        method = request.method
-        path = request.url.path
+        method = scope["method"]
         endpoint = self._normalize_endpoint(path)
+        # One pass over the raw headers; everything below reads this dict
+        request_headers = self._filter_headers(scope["headers"])
         
         # Get client IP
-        ip_address = self._get_client_ip(request)
+        ip_address = self._get_client_ip(scope, request_headers)
         
         # Extract user ID from request state (set by auth middleware)
-        user_id = getattr(request.state, "user_id", None)
+        user_id = scope.get("state", {}).get("user_id")
         
         # Capture geolocation if needed
         city = None
@@ -72,13 +164,9 @@ class APIAnalyticsMiddleware(BaseHTTPMiddleware):
         latitude = None
         longitude = None
         
-        should_track_geo = any(
-            path.startswith(geo_path) for geo_path in self.TRACK_GEOLOCATION_PATHS
-        )
-        
-        if should_track_geo and self.geolocation_service and ip_address:
+        if path.startswith(self._geo_prefixes) and self.geolocation_service and ip_address:
             try:
-                geo_data = await self.geolocation_service.get_location(ip_address)
+                geo_data = await self._get_location(ip_address)
                 if geo_data:
                     city = geo_data.get("city")
                     region = geo_data.get("region")
@@ -90,57 +178,57 @@ class APIAnalyticsMiddleware(BaseHTTPMiddleware):
                 logger.debug(f"Geolocation lookup failed for {ip_address}: {e}")
         
         # Get query parameters
-        query_params = dict(request.query_params) if request.query_params else None
+        query_string = scope.get("query_string", b"")
+        query_params = dict(parse_qsl(query_string.decode("latin-1"))) if query_string else None
         
-        # Get headers (filter sensitive ones)
-        request_headers = self._filter_headers(dict(request.headers))
-        user_agent = request.headers.get("user-agent")
-        referer = request.headers.get("referer")
+        user_agent = request_headers.get("user-agent")
+        referer = request_headers.get("referer")
         
-        # Capture request body for POST/PUT/PATCH (with size limit)
-        request_body = None
-        if method in ["POST", "PUT", "PATCH"]:
+        # Tee the request body as the app reads it, but only for small JSON
+        # POST/PUT/PATCH bodies; uploads and other payloads pass untouched
+        request_chunks = []
+        request_size = 0
+        capture_request = False
+        if method in self.BODY_METHODS:
             try:
-                # Read body without consuming it
-                body_bytes = await request.body()
-                if len(body_bytes) < 10000:  # Only capture if less than 10KB
-                    request_body = json.loads(body_bytes) if body_bytes else None
-            except Exception:
-                pass
+                content_length = int(request_headers.get("content-length") or 0)
+            except ValueError:
+                content_length = 0
+            capture_request = (
+                0 < content_length < self.MAX_REQUEST_BODY
+                and request_headers.get("content-type", "").startswith("application/json")
+            )
         
-        # Process request
-        response = None
+        async def receive_wrapper() -> Message:
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                request_size += len(body)
+                if request_size < self.MAX_REQUEST_BODY:
+                    request_chunks.append(body)
+            return message
+        
+        # Record the status and keep the start of error bodies; every
+        # message is forwarded as soon as it arrives
         status_code = 500
+        error_body = bytearray()
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and status_code >= 400:
+                room = self.MAX_ERROR_BODY - len(error_body)
+                if room > 0:
+                    error_body.extend(message.get("body", b"")[:room])
+            await send(message)
+        
+        # Process request
         error_message = None
-        response_body = None
         
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            
-            # Try to capture response body for errors (with size limit)
-            if status_code >= 400:
-                try:
-                    response_body_bytes = b""
-                    async for chunk in response.body_iterator:
-                        response_body_bytes += chunk
-                        if len(response_body_bytes) > 5000:  # Max 5KB for errors
-                            break
-                    
-                    if response_body_bytes:
-                        response_body = json.loads(response_body_bytes)
-                        error_message = response_body.get("detail") or response_body.get("message")
-                    
-                    # Recreate response with the consumed body
-                    response = Response(
-                        content=response_body_bytes,
-                        status_code=status_code,
-                        headers=dict(response.headers),
-                        media_type=response.media_type,
-                    )
-                except Exception:
-                    pass
-                    
+            await self.app(scope, receive_wrapper if capture_request else receive, send_wrapper)
         except Exception as e:
             logger.error(f"Error processing request: {e}")
             status_code = 500
@@ -148,89 +236,185 @@ class APIAnalyticsMiddleware(BaseHTTPMiddleware):
             raise
         finally:
             # Calculate response time
-            response_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            response_time_us = (time.perf_counter_ns() - start_ns) // 1000
+            
+            if status_code >= 400 or response_time_us > self.SLOW_REQUEST_US:
+                sample_rate, must_log = 1, True
+            else:
+                self._counter += 1
+                sample_rate = self._sample_rate
+                must_log = self._counter % sample_rate == 0
             
-            # Log to database asynchronously
-            asyncio.create_task(
-                self._log_analytics(
-                    endpoint=endpoint,
-                    method=method,
-                    path=path,
-                    status_code=status_code,
-                    response_time=response_time,
-                    user_id=user_id,
-                    ip_address=ip_address,
-                    city=city,
-                    region=region,
-                    country=country,
-                    country_code=country_code,
-                    latitude=latitude,
-                    longitude=longitude,
-                    query_params=query_params,
-                    request_headers=request_headers,
-                    request_body=request_body,
-                    response_body=response_body,
-                    error_message=error_message,
-                    user_agent=user_agent,
-                    referer=referer,
+            # Queue for the background batch writer
+            if must_log:
+                request_body = None
+                if request_chunks and request_size < self.MAX_REQUEST_BODY:
+                    request_body = b"".join(request_chunks)
+                
+                self._enqueue(
+                    dict(
+                        endpoint=endpoint,
+                        method=method,
+                        path=path,
+                        status_code=status_code,
+                        response_time_us=response_time_us,
+                        sample_rate=sample_rate,
+                        user_id=user_id,
+                        ip_address=ip_address,
+                        city=city,
+                        region=region,
+                        country=country,
+                        country_code=country_code,
+                        latitude=latitude,
+                        longitude=longitude,
+                        query_params=query_params,
+                        request_headers=request_headers,
+                        request_body=request_body,
+                        response_body=error_body or None,
+                        error_message=error_message,
+                        user_agent=user_agent,
+                        referer=referer,
+                    )
                 )
-            )
-        
-        return response
 
-    def _normalize_endpoint(self, path: str) -> str:
-        """Normalize endpoint path by removing IDs and dynamic segments"""
-        parts = path.split("/")
-        normalized_parts = []
-        
-        for part in parts:
-            if not part:
-                continue
-            # Replace numeric IDs with placeholder
-            if part.isdigit():
-                normalized_parts.append("{id}")
-            # Replace UUIDs with placeholder
-            elif len(part) == 36 and part.count("-") == 4:
-                normalized_parts.append("{uuid}")
-            else:
-                normalized_parts.append(part)
-        
-        return "/" + "/".join(normalized_parts)
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _normalize_endpoint(path: str) -> str:
+        """
+        Normalize endpoint path by removing IDs and dynamic segments
+        Memoized: raw paths repeat a lot, so most calls are a dict hit.
+        """
+        # Numeric IDs and UUID-shaped segments in one regex pass
+        normalized = _DYNAMIC_SEGMENT_RE.sub(_segment_placeholder, path)
+        # Collapse empty segments ("//", trailing slash) like split/join did
+        if "//" in normalized or (normalized.endswith("/") and normalized != "/"):
+            normalized = "/" + "/".join(part for part in normalized.split("/") if part)
+        return normalized
 
-    def _get_client_ip(self, request: Request) -> Optional[str]:
-        """Extract client IP address from request"""
+    @staticmethod
+    def _get_client_ip(scope: Scope, headers: dict) -> Optional[str]:
+        """
+        Extract client IP address from request, normalized to its compressed
+        form; values that aren't valid IPs are skipped
+        """
         # Check for forwarded IP first (if behind proxy)
-        forwarded = request.headers.get("x-forwarded-for")
+        forwarded = headers.get("x-forwarded-for")
         if forwarded:
-            return forwarded.split(",")[0].strip()
+            ip = _normalize_ip(forwarded.partition(",")[0].strip())
+            if ip:
+                return ip
         
         # Check for real IP header
-        real_ip = request.headers.get("x-real-ip")
+        real_ip = headers.get("x-real-ip")
         if real_ip:
-            return real_ip
+            ip = _normalize_ip(real_ip.strip())
+            if ip:
+                return ip
         
         # Fall back to direct client
-        if request.client:
-            return request.client.host
+        client = scope.get("client")
+        if client:
+            return _normalize_ip(client[0])
         
         return None
 
-    def _filter_headers(self, headers: dict) -> dict:
-        """Filter out sensitive headers"""
-        sensitive_headers = {
-            "authorization",
-            "cookie",
-            "x-api-key",
-            "x-auth-token",
-        }
-        
-        return {
-            k: v for k, v in headers.items()
-            if k.lower() not in sensitive_headers
-        }
-
-    async def _log_analytics(self, **kwargs):
-        """Log analytics data to database"""
+    @classmethod
+    def _filter_headers(cls, raw_headers) -> dict:
+        """
+        Filter out sensitive headers in one pass over the raw ASGI header
+        list. ASGI header names are already lowercase bytes, so no .lower()
+        is needed, and the result is keyed by lowercase name so later
+        lookups are plain dict hits.
+        """
+        filtered = {}
+        for name, value in raw_headers:
+            if name not in cls.SENSITIVE_HEADERS:
+                filtered[_header_name(name)] = value.decode("latin-1")
+        return filtered
+
+    @staticmethod
+    def _decode_bodies(kwargs: dict):
+        """
+        Parse the captured request/error body bytes. Runs in the logging
+        task so JSON decoding stays off the response path.
+        """
+        for key in ("request_body", "response_body"):
+            raw = kwargs.get(key)
+            if raw is None:
+                continue
+            try:
+                kwargs[key] = _json_loads(raw)
+            except Exception:
+                kwargs[key] = None
+        
+        response_body = kwargs.get("response_body")
+        if isinstance(response_body, dict) and not kwargs.get("error_message"):
+            kwargs["error_message"] = response_body.get("detail") or response_body.get("message")
+
+    async def _get_location(self, ip_address: str) -> Optional[dict]:
+        """Geolocation lookup through the per-IP cache"""
+        geo_data = self._geo_cache.get(ip_address, _MISSING)
+        if geo_data is not _MISSING:
+            return geo_data
+        
+        # Single-flight: concurrent misses for one IP share a single lookup.
+        # shield() keeps a cancelled follower from cancelling the shared future.
+        inflight = self._geo_inflight.get(ip_address)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._geo_inflight[ip_address] = future
+        geo_data = None
+        try:
+            geo_data = await self.geolocation_service.get_location(ip_address)
+            self._geo_cache.set(
+                ip_address, geo_data,
+                ttl=None if geo_data else self.GEO_NEGATIVE_TTL,
+            )
+        finally:
+            # Followers get None if the lookup raised or was cancelled
+            self._geo_inflight.pop(ip_address, None)
+            future.set_result(geo_data)
+        return geo_data
+
+    def _enqueue(self, call: dict):
+        """Buffer one call for the batch writer, starting it on first use"""
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+        try:
+            self._queue.put_nowait(call)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Analytics queue full, {self.dropped} calls dropped so far")
+
+    async def _consume(self):
+        """Drain the queue in batches and write each batch with one INSERT"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Adapt sampling to how far behind the writer is
+            if self._queue.qsize() > self.SAMPLE_HIGH_WATER * self.QUEUE_SIZE:
+                self._sample_rate = min(self._sample_rate * 2, self.MAX_SAMPLE_RATE)
+            else:
+                self._sample_rate = max(self._sample_rate // 2, 1)
+            # The write is blocking I/O; keep it off the event loop
+            await asyncio.to_thread(self._log_analytics, batch)
+
+    def _log_analytics(self, calls: list):
+        """Log a batch of analytics data to database"""
+        for call in calls:
+            self._decode_bodies(call)
         SessionLocal = get_session_local()
         if SessionLocal is None:
             logger.warning("SessionLocal not initialized, skipping analytics logging")
@@ -238,8 +422,9 @@ class APIAnalyticsMiddleware(BaseHTTPMiddleware):
         
         db: Session = SessionLocal()
         try:
-            await AnalyticsService.log_api_call(db, **kwargs)
+            AnalyticsService.log_api_calls(db, calls)
         except Exception as e:
+            db.rollback()
             logger.error(f"Failed to log analytics: {e}")
         finally:
             db.close()
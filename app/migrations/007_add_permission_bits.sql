@@ -0,0 +1,16 @@
+-- Migration: bitmask permissions
+-- Each permission name gets a bit (permissions.id, 0-62); roles, groups and
+-- user_permissions store the OR of their bits in perm_bits. NULL perm_bits
+-- means the row hasn't been backfilled yet (see migrate_permission_bits.py)
+-- and require_permission falls back to the JSON permissions list.
+-- The add_permission_bits Alembic revision applies the same change.
+-- Note: ALTER TABLE ADD COLUMN will fail silently if column already exists
+
+CREATE TABLE IF NOT EXISTS permissions (
+  id INTEGER PRIMARY KEY,
+  name TEXT UNIQUE NOT NULL
+);
+
+ALTER TABLE roles ADD COLUMN perm_bits BIGINT;
+ALTER TABLE groups ADD COLUMN perm_bits BIGINT;
+ALTER TABLE user_permissions ADD COLUMN perm_bits BIGINT;
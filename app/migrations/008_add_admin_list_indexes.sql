@@ -0,0 +1,17 @@
+-- Migration: indexes for the admin list endpoints and dashboard counts
+-- The lists page by id (keyset pagination), so each filter column is
+-- paired with id to serve filter + order + limit from one index range scan.
+
+CREATE INDEX IF NOT EXISTS ix_users_role_active ON users (role, is_active, id);
+CREATE INDEX IF NOT EXISTS ix_sessions_user_id ON sessions (user_id, id DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_logs_user_id ON audit_logs (user_id, id DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_logs_action_id ON audit_logs (action, id DESC);
+
+-- Active-session count (revoked = FALSE AND expires_at > NOW()); the
+-- add_stats_counters alembic migration creates the same index on PostgreSQL
+CREATE INDEX IF NOT EXISTS idx_sessions_active ON sessions (expires_at) WHERE revoked = FALSE;
+
+-- Refresh planner statistics so the new indexes are picked up
+ANALYZE users;
+ANALYZE sessions;
+ANALYZE audit_logs;
@@ -1,5 +1,5 @@
 import sqlalchemy
-from sqlalchemy import Table, Column, Integer, String, Boolean, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Table, Column, Integer, BigInteger, String, Boolean, DateTime, Text, JSON, ForeignKey
 from sqlalchemy.sql import func
 
 metadata = sqlalchemy.MetaData()
@@ -25,6 +25,14 @@ users = Table(
     Column("last_login", DateTime, nullable=True),
 )
 
+# Permission registry; id is the permission's bit position in perm_bits masks
+permissions = Table(
+    "permissions",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("name", String, unique=True, nullable=False),
+)
+
 roles = Table(
     "roles",
     metadata,
@@ -32,6 +40,7 @@ roles = Table(
     Column("name", String, unique=True, nullable=False),
     Column("description", String, nullable=True),
     Column("permissions", Text, default="[]"),
+    Column("perm_bits", BigInteger, nullable=True),
     Column("created_at", DateTime, server_default=func.now()),
 )
 
@@ -42,6 +51,7 @@ groups = Table(
     Column("name", String, unique=True, nullable=False),
     Column("description", String, nullable=True),
     Column("permissions", Text, default="[]"),
+    Column("perm_bits", BigInteger, nullable=True),
     Column("created_at", DateTime, server_default=func.now()),
 )
 
@@ -57,6 +67,7 @@ user_permissions = Table(
     metadata,
     Column("user_id", Integer, nullable=False),
     Column("permission", String, nullable=False),
+    Column("perm_bits", BigInteger, nullable=True),
 )
 
 sessions = Table(
@@ -1,6 +1,6 @@
 """ORM Models package for SQLAlchemy ORM-based models"""
 from .payment import Order, Payment, Transaction, Coupon, PaymentStatus, OrderStatus
-from .analytics import APIAnalytics
+from .analytics import APIAnalytics, APIAnalyticsPayload
 
 __all__ = [
     'Order',
@@ -10,4 +10,5 @@ __all__ = [
     'PaymentStatus',
     'OrderStatus',
     'APIAnalytics',
+    'APIAnalyticsPayload',
 ]
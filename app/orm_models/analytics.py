@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Index
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, Text, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import INET, JSONB
 from datetime import datetime
 from app.db.database import Base
 
@@ -7,52 +8,77 @@ class APIAnalytics(Base):
     """Model for tracking API requests and performance metrics"""
     __tablename__ = "api_analytics"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
     
     # Request Information
-    endpoint = Column(String(500), nullable=False, index=True)
-    method = Column(String(10), nullable=False, index=True)  # GET, POST, PUT, DELETE, etc.
+    endpoint = Column(String(500), nullable=False)
+    method = Column(String(10), nullable=False)  # GET, POST, PUT, DELETE, etc.
     path = Column(String(500), nullable=False)
-    query_params = Column(Text, nullable=True)  # JSON string of query parameters
     
     # Response Information
-    status_code = Column(Integer, nullable=False, index=True)
-    response_time = Column(Float, nullable=False)  # in milliseconds
+    status_code = Column(Integer, nullable=False)
+    response_time_us = Column(Integer, nullable=False)  # in microseconds
+    # Fast successful requests are sampled under load; each row stands for
+    # sample_rate requests, so aggregates weight by it
+    sample_rate = Column(SmallInteger, nullable=False, default=1, server_default='1')
     
     # User Information
-    user_id = Column(Integer, nullable=True, index=True)  # No FK constraint - users table is SQLAlchemy Core
+    user_id = Column(Integer, nullable=True)  # No FK constraint - users table is SQLAlchemy Core
     # Note: User relationship not defined since users table uses SQLAlchemy Core
     
     # IP and Geolocation
-    ip_address = Column(String(45), nullable=True, index=True)  # IPv6 max length
-    city = Column(String(100), nullable=True, index=True)
+    ip_address = Column(String(45).with_variant(INET(), "postgresql"), nullable=True)
+    city = Column(String(100), nullable=True)
     region = Column(String(100), nullable=True)
-    country = Column(String(100), nullable=True, index=True)
+    country = Column(String(100), nullable=True)
     country_code = Column(String(2), nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     
-    # Request/Response Data (for debugging)
-    request_headers = Column(Text, nullable=True)  # JSON string
-    request_body = Column(Text, nullable=True)  # JSON string (limited size)
-    response_body = Column(Text, nullable=True)  # JSON string (limited size)
-    error_message = Column(Text, nullable=True)
-    
-    # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Error message, user agent, referer and request/response payloads live
+    # in APIAnalyticsPayload so this row stays narrow
     
-    # Additional metadata
-    user_agent = Column(String(500), nullable=True)
-    referer = Column(String(500), nullable=True)
+    # Timestamps (part of the primary key because the table is partitioned on it)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
 
-    # Create composite indexes for common queries
+    # Composite indexes for common queries. Every index is maintained on each
+    # INSERT, so single-column indexes are left off this write-heavy table.
     __table_args__ = (
         Index('idx_endpoint_method', 'endpoint', 'method'),
-        Index('idx_endpoint_created', 'endpoint', 'created_at'),
+        # Time-bounded queries, optionally narrowed to an endpoint
+        Index('idx_created_endpoint', created_at.desc(), endpoint, postgresql_using='btree'),
         Index('idx_status_created', 'status_code', 'created_at'),
         Index('idx_user_created', 'user_id', 'created_at'),
         Index('idx_city_country', 'city', 'country'),
+        # BRIN suits the append-only, monotonically increasing created_at column
+        Index('idx_api_analytics_created_at_brin', 'created_at', postgresql_using='brin', postgresql_with={'pages_per_range': 128}),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    def __repr__(self):
+        return f"<APIAnalytics {self.method} {self.endpoint} - {self.status_code} ({self.response_time_us}us)>"
+
+
+class APIAnalyticsPayload(Base):
+    """Request/response payloads for an API call, kept apart from the narrow analytics row"""
+    __tablename__ = "api_analytics_payloads"
+
+    # Matches APIAnalytics' (id, created_at) primary key
+    analytics_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    created_at = Column(DateTime, nullable=False, primary_key=True)
+
+    # Request/Response Data (for debugging)
+    query_params = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    request_headers = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    request_body = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # limited size
+    response_body = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # limited size
+    error_message = Column(Text, nullable=True)
+    user_agent = Column(String(500), nullable=True)
+    referer = Column(String(500), nullable=True)
+
+    __table_args__ = (
+        {'postgresql_partition_by': 'RANGE (created_at)'},
     )
 
     def __repr__(self):
-        return f"<APIAnalytics {self.method} {self.endpoint} - {self.status_code} ({self.response_time}ms)>"
+        return f"<APIAnalyticsPayload {self.analytics_id}>"
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, ForeignKey, Text, Identity, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 import enum
 
+# 64-bit identity keys on PostgreSQL; SQLite only autoincrements INTEGER PRIMARY KEY
+BigIntId = BigInteger().with_variant(Integer, "sqlite")
+
 
 class PaymentStatus(enum.Enum):
     PENDING = "pending"
@@ -25,7 +28,7 @@ class OrderStatus(enum.Enum):
 class Order(Base):
     __tablename__ = "orders"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigIntId, Identity(always=False, cache=100), primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)  # No FK - users table is SQLAlchemy Core
     course_id = Column(Integer, nullable=False, index=True)  # No FK - courses table is SQLAlchemy Core
     
@@ -58,8 +61,8 @@ class Order(Base):
 class Payment(Base):
     __tablename__ = "payments"
 
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    id = Column(BigIntId, Identity(always=False, cache=100), primary_key=True, index=True)
+    order_id = Column(BigIntId, ForeignKey("orders.id"), nullable=False)
     
     # Stripe details
     stripe_payment_intent_id = Column(String(255), unique=True, nullable=False, index=True)
@@ -91,9 +94,9 @@ class Payment(Base):
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigIntId, Identity(always=False, cache=100), primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)  # No FK - users table is SQLAlchemy Core
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    order_id = Column(BigIntId, ForeignKey("orders.id"), nullable=True)
     
     # Transaction details
     transaction_type = Column(String(50), nullable=False)  # purchase, refund, withdrawal
@@ -118,7 +121,7 @@ class Transaction(Base):
 class Coupon(Base):
     __tablename__ = "coupons"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigIntId, Identity(always=False, cache=100), primary_key=True, index=True)
     
     # Coupon details
     code = Column(String(50), unique=True, nullable=False, index=True)
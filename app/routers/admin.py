@@ -1,16 +1,124 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import String, bindparam, func, literal, null, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from datetime import datetime
-
-from app.core.dependencies import require_admin, get_current_user
+from itertools import chain
+import asyncio
+import json
+import logging
+import time
+
+from app.core.cache import RedisBackedCache, TTLCache
+from app.core.dependencies import require_admin, get_current_user, invalidate_user
 from app.services.d1_service import database
 from app.services.permission_service import permission_service
 from app.services.gdpr_service import gdpr_service
 from app.models import users, roles, groups, sessions, audit_logs
 from app.core.security import hash_password
 
-router = APIRouter()
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as _ResponseClass
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # orjson is optional
+    _ResponseClass = JSONResponse
+    _json_loads = json.loads
+
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode()
+
+router = APIRouter(default_response_class=_ResponseClass)
+logger = logging.getLogger(__name__)
+
+# Dashboard counts shared across workers; polling admin UIs read this
+# instead of re-running the COUNT queries on every load
+_stats_cache = RedisBackedCache("admin_stats", maxsize=1, ttl=45)
+STATS_CACHE_KEY = "v1"
+
+# After a failed read of stats_counters (missing on SQLite, where the
+# add_stats_counters migration doesn't apply, or a transient error such as
+# a pool or statement timeout), count rows directly for this long before
+# trying the counters again
+COUNTERS_RETRY_SECONDS = 300
+_counters_retry_at = 0.0
+
+# Parsed role list keyed by permission_service.roles_version, so a role
+# write in this worker misses immediately; other workers refresh on expiry
+_roles_cache = TTLCache(maxsize=1, ttl=60)
+
+
+class _iso_timestamp(FunctionElement):
+    """
+    A timestamp column rendered as ISO 8601 text by the database, so list
+    responses pass the string through instead of the driver building a
+    datetime only for .isoformat() to turn it back into text. Matches
+    .isoformat() on both backends: microseconds, left off when zero.
+    """
+    type = String()
+    inherit_cache = True
+
+
+@compiles(_iso_timestamp)
+def _iso_timestamp_postgresql(element, compiler, **kw):
+    (column,) = element.clauses
+    return compiler.process(
+        func.replace(func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS.US'), '.000000', ''), **kw
+    )
+
+
+@compiles(_iso_timestamp, "sqlite")
+def _iso_timestamp_sqlite(element, compiler, **kw):
+    # SQLite keeps the text SQLAlchemy wrote ("YYYY-MM-DD HH:MM:SS.ffffff")
+    # or CURRENT_TIMESTAMP's "YYYY-MM-DD HH:MM:SS"; strftime('%f') would cut
+    # the microseconds to milliseconds, so reformat the text instead
+    (column,) = element.clauses
+    return compiler.process(
+        func.replace(func.replace(column, ' ', 'T'), '.000000', ''), **kw
+    )
+
+
+def _next_cursor(rows, limit: int) -> Optional[int]:
+    """Cursor for the page after `rows` (its last id), or None on the last page"""
+    return rows[-1]["id"] if len(rows) == limit else None
+
+
+# Statements built once at import rather than per request. Per-request values
+# are bound parameters, and the list endpoints add their filters to these
+# (Select is immutable, so the shared base is never modified).
+_USER_BY_ID = users.select().where(users.c.id == bindparam("user_id"))
+_USER_BY_EMAIL = users.select().where(users.c.email == bindparam("email"))
+
+# List queries select only the columns the response uses (never
+# hashed_password or refresh_token), labelled with the response field names
+# so fetched rows are returned as-is
+_USER_LIST = select(
+    users.c.id, users.c.email, users.c.full_name, users.c.role,
+    users.c.is_active, users.c.is_verified, users.c.oauth_provider,
+    _iso_timestamp(users.c.created_at).label("created_at"),
+    _iso_timestamp(users.c.last_login).label("last_login"),
+)
+_SESSION_LIST = select(
+    sessions.c.id, sessions.c.user_id,
+    sessions.c.ip.label("ip_address"),
+    sessions.c.user_agent,
+    # Not tracked on sessions; kept in the response for the frontend
+    null().label("device_type"),
+    null().label("browser"),
+    null().label("os"),
+    literal(True).label("is_active"),
+    _iso_timestamp(sessions.c.created_at).label("created_at"),
+    _iso_timestamp(sessions.c.last_active_at).label("last_activity"),
+)
+_AUDIT_LOG_LIST = select(
+    audit_logs.c.id, audit_logs.c.user_id, audit_logs.c.action,
+    audit_logs.c.ip_address, audit_logs.c.user_agent, audit_logs.c.meta,
+    _iso_timestamp(audit_logs.c.created_at).label("timestamp"),
+)
 
 
 # ===== Request/Response Models =====
@@ -76,83 +184,113 @@ def get_current_admin(current_user: dict = Depends(get_current_user)):
 
 # ===== Dashboard Stats =====
 
-@router.get('/stats', dependencies=[Depends(require_admin)])
-def get_admin_stats():
+# Dashboard counts are fetched in one statement (one round trip). Active
+# sessions use FALSE and CURRENT_TIMESTAMP, which both PostgreSQL and SQLite
+# accept, and are an index-only scan of idx_sessions_active.
+_ACTIVE_SESSIONS_COUNT = "SELECT COUNT(*) FROM sessions WHERE revoked = FALSE AND expires_at > CURRENT_TIMESTAMP"
+
+# User and audit log counts from the trigger-maintained stats_counters table
+# (see the shard_stats_counters migration, or migrate_stats_counters.py on
+# SQLite), summed over its shard rows; COALESCE only runs the COUNT(*) when
+# a counter has no rows
+_STATS_FROM_COUNTERS = f"""
+    SELECT
+        COALESCE((SELECT SUM(value) FROM stats_counters WHERE name = 'users'),
+                 (SELECT COUNT(*) FROM users)) AS total_users,
+        ({_ACTIVE_SESSIONS_COUNT}) AS active_sessions,
+        COALESCE((SELECT SUM(value) FROM stats_counters WHERE name = 'audit_logs'),
+                 (SELECT COUNT(*) FROM audit_logs)) AS audit_logs
+"""
+
+_STATS_FROM_TABLES = f"""
+    SELECT
+        (SELECT COUNT(*) FROM users) AS total_users,
+        ({_ACTIVE_SESSIONS_COUNT}) AS active_sessions,
+        (SELECT COUNT(*) FROM audit_logs) AS audit_logs
+"""
+
+
+def _fetch_stats() -> dict:
+    """Run the dashboard counts, counting rows directly if stats_counters is unavailable"""
+    global _counters_retry_at
+    if time.monotonic() >= _counters_retry_at:
+        try:
+            return database.fetch_one(_STATS_FROM_COUNTERS)
+        except Exception as e:
+            _counters_retry_at = time.monotonic() + COUNTERS_RETRY_SECONDS
+            logger.warning(f"stats_counters unavailable, counting rows instead: {e}")
+    return database.fetch_one(_STATS_FROM_TABLES)
+
+
+@router.get('/stats', response_model=None, dependencies=[Depends(require_admin)])
+async def get_admin_stats():
     """Get dashboard statistics."""
-    # Count total users
-    total_users = database.fetch_val(
-        query="SELECT COUNT(*) FROM users"
-    )
+    # Redis and the database driver are blocking; keep them off the event loop
+    cached = await asyncio.to_thread(_stats_cache.get, STATS_CACHE_KEY)
+    if cached is not None:
+        return _ResponseClass(cached)
     
-    # Count active sessions (not revoked and not expired)
-    # Use FALSE for PostgreSQL boolean comparison and NOW() instead of datetime('now')
-    active_sessions = database.fetch_val(
-        query="SELECT COUNT(*) FROM sessions WHERE revoked = FALSE AND expires_at > NOW()"
-    )
-    
-    # Count audit logs
-    total_audit_logs = database.fetch_val(
-        query="SELECT COUNT(*) FROM audit_logs"
-    )
+    counts = await asyncio.to_thread(_fetch_stats)
     
-    return {
-        "total_users": total_users or 0,
-        "active_sessions": active_sessions or 0,
-        "audit_logs": total_audit_logs or 0,
+    stats = {
+        "total_users": counts["total_users"] or 0,
+        "active_sessions": counts["active_sessions"] or 0,
+        "audit_logs": counts["audit_logs"] or 0,
         "total_courses": 6,  # Static for now
     }
+    await asyncio.to_thread(_stats_cache.set, STATS_CACHE_KEY, stats)
+    return _ResponseClass(stats)
 
 
 # ===== User Management =====
 
-@router.get('/users', dependencies=[Depends(require_admin)])
+@router.get('/users', response_model=None, dependencies=[Depends(require_admin)])
 def list_users(
     skip: int = 0,
     limit: int = 100,
     role: Optional[str] = None,
     is_active: Optional[bool] = None,
+    cursor: Optional[int] = None,
 ):
-    """List all users with optional filters."""
-    query = users.select()
+    """
+    List all users with optional filters.
+    Pass the previous page's next_cursor as `cursor` to page by id instead
+    of `skip`, which costs the same at any depth.
+    """
+    query = _USER_LIST
     
     if role:
         query = query.where(users.c.role == role)
     if is_active is not None:
         query = query.where(users.c.is_active == is_active)
     
-    query = query.offset(skip).limit(limit)
+    if cursor is not None:
+        query = query.where(users.c.id > cursor)
+    else:
+        query = query.offset(skip)
+    query = query.order_by(users.c.id).limit(limit)
     
     result = database.fetch_all(query)
-    return {
-        "users": [
-            {
-                "id": u["id"],
-                "email": u["email"],
-                "full_name": u["full_name"],
-                "role": u["role"],
-                "is_active": u["is_active"],
-                "is_verified": u["is_verified"],
-                "oauth_provider": u["oauth_provider"],
-                "created_at": u["created_at"].isoformat() if u["created_at"] else None,
-                "last_login": u["last_login"].isoformat() if u["last_login"] else None,
-            }
-            for u in result
-        ]
-    }
+    return _ResponseClass({
+        "users": result,
+        "next_cursor": _next_cursor(result, limit),
+    })
 
 
 @router.post('/users', dependencies=[Depends(require_admin)])
-def create_user(payload: UserCreate):
+async def create_user(payload: UserCreate):
     """Create a new user."""
-    # Check if exists
-    check_query = users.select().where(users.c.email == payload.email)
-    existing = database.fetch_one(check_query)
+    # Check if exists before paying for the password hash. Database calls and
+    # the hash are blocking, so each runs in a worker thread.
+    existing = await asyncio.to_thread(
+        database.fetch_one, _USER_BY_EMAIL, {"email": payload.email}
+    )
     
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
     
-    # Hash password
-    hashed_password = hash_password(payload.password)
+    # Hash password (a deliberately slow KDF)
+    hashed_password = await asyncio.to_thread(hash_password, payload.password)
     
     # Create user
     insert_query = users.insert().values(
@@ -163,22 +301,19 @@ def create_user(payload: UserCreate):
         is_active=True,
         is_verified=True,  # Admin-created users are pre-verified
         created_at=datetime.utcnow(),
-    )
+    ).returning(*users.c)
     
-    user_id = database.execute(insert_query)
+    # RETURNING hands back the created row, so no follow-up SELECT
+    user = await asyncio.to_thread(database.execute_returning, insert_query)
+    await asyncio.to_thread(_stats_cache.pop, STATS_CACHE_KEY)
     
-    # Fetch created user
-    query = users.select().where(users.c.id == user_id)
-    user = database.fetch_one(query)
-    
-    return {"user": dict(user)}
+    return {"user": user}
 
 
 @router.get('/users/{user_id}', dependencies=[Depends(require_admin)])
 def get_user(user_id: int):
     """Get user details."""
-    query = users.select().where(users.c.id == user_id)
-    user = database.fetch_one(query)
+    user = database.fetch_one(_USER_BY_ID, {"user_id": user_id})
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -205,21 +340,24 @@ def update_user(user_id: int, payload: UserUpdate):
     
     update_query = users.update().where(
         users.c.id == user_id
-    ).values(**update_values)
-    
-    database.execute(update_query)
+    ).values(**update_values).returning(*users.c)
     
-    # Fetch updated user
-    query = users.select().where(users.c.id == user_id)
-    user = database.fetch_one(query)
+    # RETURNING hands back the updated row, so no follow-up SELECT
+    user = database.execute_returning(update_query)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
+    if payload.role is not None:
+        permission_service.invalidate_user_permissions(user_id)
     
-    return {"user": dict(user)}
+    return {"user": user}
 
 
 @router.delete('/users/{user_id}', dependencies=[Depends(require_admin)])
 def delete_user(user_id: int, hard_delete: bool = False):
     """Delete user account (soft delete by default)."""
     result = gdpr_service.delete_user_account(user_id, hard_delete=hard_delete)
+    _stats_cache.pop(STATS_CACHE_KEY)
     return result
 
 
@@ -228,15 +366,19 @@ def delete_user(user_id: int, hard_delete: bool = False):
 @router.get('/roles', dependencies=[Depends(require_admin)])
 def list_roles():
     """List all roles."""
-    import json
-    result = permission_service.get_all_roles()
-    # Parse permissions JSON string to array for frontend
-    for role in result:
-        if isinstance(role.get('permissions'), str):
-            try:
-                role['permissions'] = json.loads(role['permissions'])
-            except:
-                role['permissions'] = []
+    version = permission_service.roles_version
+    result = _roles_cache.get(version)
+    if result is None:
+        result = permission_service.get_all_roles()
+        # Parse permissions JSON string to array for frontend
+        for role in result:
+            if isinstance(role.get('permissions'), str):
+                try:
+                    role['permissions'] = _json_loads(role['permissions'])
+                except (ValueError, TypeError):
+                    role['permissions'] = []
+        result = tuple(result)
+        _roles_cache.set(version, result)
     return {"roles": result}
 
 
@@ -370,41 +512,34 @@ def get_user_permissions(user_id: int):
 
 # ===== Session Management =====
 
-@router.get('/sessions', dependencies=[Depends(require_admin)])
+@router.get('/sessions', response_model=None, dependencies=[Depends(require_admin)])
 def list_sessions(
     user_id: Optional[int] = None,
     is_active: Optional[bool] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[int] = None,
 ):
-    """List all sessions with optional filters."""
-    query = sessions.select()
+    """List all sessions with optional filters, newest first (see list_users for `cursor`)."""
+    query = _SESSION_LIST
     
     if user_id:
         query = query.where(sessions.c.user_id == user_id)
     if is_active is not None:
         query = query.where(sessions.c.is_active == is_active)
     
-    query = query.order_by(sessions.c.created_at.desc()).offset(skip).limit(limit)
+    # ids increase with created_at, so id order is creation order
+    if cursor is not None:
+        query = query.where(sessions.c.id < cursor)
+    else:
+        query = query.offset(skip)
+    query = query.order_by(sessions.c.id.desc()).limit(limit)
     
     result = database.fetch_all(query)
-    return {
-        "sessions": [
-            {
-                "id": s["id"],
-                "user_id": s["user_id"],
-                "ip_address": s.get("ip") or s.get("ip_address"),  # Handle both column names
-                "user_agent": s["user_agent"],
-                "device_type": s.get("device_type"),
-                "browser": s.get("browser"),
-                "os": s.get("os"),
-                "is_active": s.get("is_active", True),
-                "created_at": s["created_at"].isoformat() if s.get("created_at") else None,
-                "last_activity": s.get("last_active_at").isoformat() if s.get("last_active_at") else None,
-            }
-            for s in result
-        ]
-    }
+    return _ResponseClass({
+        "sessions": result,
+        "next_cursor": _next_cursor(result, limit),
+    })
 
 
 @router.post('/sessions/{session_id}/revoke', dependencies=[Depends(require_admin)])
@@ -417,42 +552,65 @@ def revoke_session(session_id: int):
         revoked_at=datetime.utcnow(),
     )
     database.execute(update_query)
+    _stats_cache.pop(STATS_CACHE_KEY)
     
     return {"ok": True, "message": "Session revoked"}
 
 
 # ===== Audit Logs =====
 
-@router.get('/audit-logs', dependencies=[Depends(require_admin)])
+@router.get('/audit-logs', response_model=None, dependencies=[Depends(require_admin)])
 def list_audit_logs(
     user_id: Optional[int] = None,
     action: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[int] = None,
 ):
-    """List audit logs with optional filters."""
-    import json
-    query = audit_logs.select()
+    """
+    List audit logs with optional filters, newest first (see list_users for
+    `cursor`). The page is streamed: each row is serialized as it comes off
+    the database cursor, so the first bytes go out before the last row is
+    read and the page is never held in memory as a whole.
+    """
+    query = _AUDIT_LOG_LIST
     
     if user_id:
         query = query.where(audit_logs.c.user_id == user_id)
     if action:
         query = query.where(audit_logs.c.action == action)
     
-    query = query.order_by(audit_logs.c.created_at.desc()).offset(skip).limit(limit)
+    # ids increase with created_at, so id order is creation order
+    if cursor is not None:
+        query = query.where(audit_logs.c.id < cursor)
+    else:
+        query = query.offset(skip)
+    query = query.order_by(audit_logs.c.id.desc()).limit(limit)
     
-    result = database.fetch_all(query)
-    return {
-        "logs": [
-            {
-                "id": log["id"],
-                "user_id": log["user_id"],
-                "action": log["action"],
-                "ip_address": log["ip_address"],
-                "user_agent": log["user_agent"],
-                "meta": json.loads(log["meta"]) if log["meta"] else {},
-                "timestamp": log["created_at"].isoformat() if log["created_at"] else None,
-            }
-            for log in result
-        ]
-    }
+    # Run the query and read the first row before the response starts, so
+    # a failing query still becomes a 500 instead of a truncated 200
+    rows = database.iterate(query)
+    first = next(rows, None)
+    
+    def stream_page():
+        yield b'{"logs":['
+        count, last_id = 0, None
+        try:
+            if first is not None:
+                for log in chain([first], rows):
+                    # meta is stored as JSON text; decode it so it nests as an object
+                    log["meta"] = _json_loads(log["meta"]) if log["meta"] else {}
+                    yield (b"," if count else b"") + _json_dumps(log)
+                    count, last_id = count + 1, log["id"]
+        except Exception as e:
+            # The status line is already sent; end the body early so the
+            # client gets invalid JSON rather than a silently short page
+            logger.exception(f"Audit log stream failed after {count} rows: {e}")
+            return
+        finally:
+            # Release the connection even if the client disconnects mid-page
+            rows.close()
+        # Same rule as _next_cursor: only a full page has a next one
+        yield b'],"next_cursor":' + _json_dumps(last_id if count == limit else None) + b"}"
+    
+    return StreamingResponse(stream_page(), media_type="application/json")
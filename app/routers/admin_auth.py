@@ -1,38 +1,54 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, EmailStr, ValidationError
+import hmac
+import logging
 from app.config.settings import settings
 from app.core.jwt import create_access_token, create_refresh_token
 from app.core.security import verify_password, hash_password
 
 router = APIRouter()
+logger = logging.getLogger("lms.admin_auth")
+
+# Expected credentials as bytes, built once for constant-time comparison
+_ADMIN_EMAIL = settings.ADMIN_EMAIL.encode()
+_ADMIN_PASSWORD = settings.ADMIN_PASSWORD.encode()
 
 class AdminLoginRequest(BaseModel):
     email: EmailStr
     password: str
 
 
-@router.post('/login')
-def admin_login(payload: AdminLoginRequest):
+@router.post(
+    '/login',
+    # The body is parsed by hand below; document it for OpenAPI explicitly
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": AdminLoginRequest.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+async def admin_login(request: Request):
     """
     Admin login using credentials from .env file.
     Does not require database lookup.
     """
-    import logging
-    logger = logging.getLogger("lms.admin_auth")
-    
-    logger.info(f"Login attempt - Email from request: {payload.email}")
-    logger.info(f"Login attempt - Expected email: {settings.ADMIN_EMAIL}")
-    logger.info(f"Login attempt - Expected password: {settings.ADMIN_PASSWORD}")
-    
-    # Validate against .env credentials
-    if payload.email != settings.ADMIN_EMAIL:
-        logger.warning(f"Email mismatch: {payload.email} != {settings.ADMIN_EMAIL}")
-        raise HTTPException(status_code=401, detail="Invalid admin credentials")
+    # Validate straight from the raw bytes: pydantic-core parses the JSON
+    # itself instead of FastAPI building a dict first
+    try:
+        payload = AdminLoginRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
     
-    # For env-based password, we compare directly (not hashed in env)
-    # In production, you might want to hash the env password as well
-    if payload.password != settings.ADMIN_PASSWORD:
-        logger.warning(f"Password mismatch")
+    # Validate against .env credentials. For env-based password, we compare
+    # directly (not hashed in env); in production, you might want to hash the
+    # env password as well. Both checks always run, in constant time, so the
+    # response timing doesn't reveal which one failed.
+    email_ok = hmac.compare_digest(payload.email.encode(), _ADMIN_EMAIL)
+    password_ok = hmac.compare_digest(payload.password.encode(), _ADMIN_PASSWORD)
+    if not (email_ok & password_ok):
+        logger.warning("Admin login failed")
         raise HTTPException(status_code=401, detail="Invalid admin credentials")
     
     # Create tokens with extra claims for email and role
@@ -221,21 +221,15 @@ async def get_comparison_stats(
         
         current_start = end_date - delta
         previous_start = current_start - delta
-        previous_end = current_start
         
-        # Get stats for both periods
-        current_stats = await AnalyticsService.get_overview_stats(
+        # Get stats for both periods in one query
+        current_stats, previous_stats = await AnalyticsService.get_comparison_stats(
             db=db,
-            start_date=current_start,
+            previous_start=previous_start,
+            current_start=current_start,
             end_date=end_date,
         )
         
-        previous_stats = await AnalyticsService.get_overview_stats(
-            db=db,
-            start_date=previous_start,
-            end_date=previous_end,
-        )
-        
         # Calculate changes
         def calculate_change(current, previous):
             if previous == 0:
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, Cookie
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, Cookie
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timedelta
+import hashlib
+import hmac
 import secrets
+import time
+
+from sqlalchemy import select
 
 from app.services import auth_service
 from app.services.d1_service import database
@@ -10,11 +15,53 @@ from app.services.email_service import send_password_reset_email, send_security_
 from app.services.oauth_service import oauth_service
 from app.config.settings import settings
 from app.models import users, password_reset_tokens, email_verification_tokens
-from app.core.jwt import create_reset_token, decode_token
+from app.core.jwt import create_reset_token, decode_token, invalidate_token
 from app.core.security import hash_password
+from app.core.dependencies import invalidate_user
 
 router = APIRouter()
 
+# OAuth CSRF state, issued by the login endpoints and checked once by the
+# provider's callback. The browser carries it in a signed, short-lived cookie,
+# so the callback verifies on whichever worker it lands without shared storage.
+OAUTH_STATE_TTL = 600
+OAUTH_STATE_COOKIE = "oauth_state"
+_OAUTH_STATE_KEY = hashlib.sha256(b"oauth-state:" + settings.SECRET_KEY.encode()).digest()
+
+
+def _sign_oauth_state(value: str) -> str:
+    return hmac.new(_OAUTH_STATE_KEY, value.encode(), hashlib.sha256).hexdigest()
+
+
+def _issue_oauth_state(provider: str, response: Response) -> str:
+    state = secrets.token_urlsafe(32)
+    value = f"{provider}:{state}:{int(time.time()) + OAUTH_STATE_TTL}"
+    response.set_cookie(
+        OAUTH_STATE_COOKIE,
+        f"{value}:{_sign_oauth_state(value)}",
+        max_age=OAUTH_STATE_TTL,
+        httponly=True,
+        secure=not settings.DEBUG,
+        samesite="lax",
+    )
+    return state
+
+
+def _consume_oauth_state(provider: str, state: str, cookie: Optional[str], response: Response):
+    """Reject a callback whose state doesn't match the unexpired cookie issued for this provider"""
+    response.delete_cookie(OAUTH_STATE_COOKIE)
+    value, _, signature = (cookie or "").rpartition(":")
+    issued_provider, _, rest = value.partition(":")
+    issued_state, _, expires_at = rest.rpartition(":")
+    if not (
+        hmac.compare_digest(signature.encode(), _sign_oauth_state(value).encode())
+        and issued_provider == provider
+        and hmac.compare_digest(issued_state.encode(), state.encode())
+        and expires_at.isdigit()
+        and int(expires_at) > time.time()
+    ):
+        raise HTTPException(status_code=400, detail="Invalid or expired OAuth state")
+
 
 class RegisterIn(BaseModel):
     email: EmailStr
@@ -52,9 +99,8 @@ def login(payload: LoginIn, request: Request, response: Response):
     if not data:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Fetch user data to return in response
-    user_query = users.select().where(users.c.email == payload.email)
-    user_data = database.fetch_one(user_query)
+    # authenticate_user already loaded the user row
+    user_data = data['user']
     
     # set refresh token as httpOnly cookie
     response.set_cookie("refresh_token", data['refresh_token'], httponly=True, secure=not settings.DEBUG, samesite='lax')
@@ -149,11 +195,21 @@ def forgot_password(
     return {"ok": True, "message": "If the email exists, a reset link has been sent"}
 
 
+def _send_security_notification(**kwargs):
+    """send_security_notification for a background task: log failures, never raise"""
+    try:
+        send_security_notification(**kwargs)
+    except Exception as e:
+        import logging
+        logging.error(f"Failed to send security notification: {e}")
+
+
 @router.post('/reset-password')
 def reset_password(
     token: str,
     new_password: str,
     request: Request,
+    background_tasks: BackgroundTasks,
 ):
     """
     Reset password using token from email.
@@ -167,8 +223,14 @@ def reset_password(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
-    # Check token exists in database and not used
-    query = password_reset_tokens.select().where(
+    # Check token exists and not used, fetching the user's email with it
+    # (outer join, so a token whose user is gone is still told apart)
+    query = select(
+        password_reset_tokens.c.id,
+        users.c.email,
+    ).select_from(
+        password_reset_tokens.outerjoin(users, users.c.id == password_reset_tokens.c.user_id)
+    ).where(
         (password_reset_tokens.c.token == token) &
         (password_reset_tokens.c.user_id == user_id) &
         (password_reset_tokens.c.used_at == None) &
@@ -179,42 +241,37 @@ def reset_password(
     if not token_record:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
-    # Get user
-    user_query = users.select().where(users.c.id == user_id)
-    user = database.fetch_one(user_query)
-    
-    if not user:
+    if token_record["email"] is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Update password
+    # Update password and mark the token as used in one transaction
     hashed_password = hash_password(new_password)
     update_query = users.update().where(
         users.c.id == user_id
     ).values(
         hashed_password=hashed_password,
     )
-    database.execute(update_query)
-    
-    # Mark token as used
     mark_used_query = password_reset_tokens.update().where(
         password_reset_tokens.c.id == token_record["id"]
     ).values(
         used_at=datetime.utcnow(),
     )
-    database.execute(mark_used_query)
+    with database.transaction() as connection:
+        connection.execute(update_query)
+        connection.execute(mark_used_query)
+    invalidate_user(user_id)
+    invalidate_token(token)
     
-    # Send security notification
-    try:
-        send_security_notification(
-            email=user["email"],
-            notification_type="Password Changed",
-            details="Your password was successfully reset.",
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent"),
-        )
-    except Exception as e:
-        import logging
-        logging.error(f"Failed to send security notification: {e}")
+    # Send security notification after the response so the email provider's
+    # latency isn't part of the request
+    background_tasks.add_task(
+        _send_security_notification,
+        email=token_record["email"],
+        notification_type="Password Changed",
+        details="Your password was successfully reset.",
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent"),
+    )
     
     return {"ok": True, "message": "Password reset successful"}
 
@@ -245,32 +302,32 @@ def verify_email(token: str):
     if not token_record:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
-    # Update user as verified
+    # Mark the user verified and the token used in one transaction
     update_query = users.update().where(
         users.c.id == user_id
     ).values(
         is_verified=True,
     )
-    database.execute(update_query)
-    
-    # Mark token as used
     mark_used_query = email_verification_tokens.update().where(
         email_verification_tokens.c.id == token_record["id"]
     ).values(
         used_at=datetime.utcnow(),
     )
-    database.execute(mark_used_query)
+    with database.transaction() as connection:
+        connection.execute(update_query)
+        connection.execute(mark_used_query)
+    invalidate_user(user_id)
+    invalidate_token(token)
     
     return {"ok": True, "message": "Email verified successfully"}
 
 
 @router.get('/oauth/google')
-def oauth_google_login():
+def oauth_google_login(response: Response):
     """
     Redirect to Google OAuth authorization.
     """
-    state = secrets.token_urlsafe(32)
-    # TODO: Store state in session/redis for CSRF protection
+    state = _issue_oauth_state("google", response)
     try:
         auth_url = oauth_service.get_google_auth_url(state)
         return {"auth_url": auth_url}
@@ -284,11 +341,12 @@ def oauth_google_callback(
     state: str,
     request: Request,
     response: Response,
+    oauth_state_cookie: str | None = Cookie(None, alias=OAUTH_STATE_COOKIE),
 ):
     """
     Handle Google OAuth callback.
     """
-    # TODO: Validate state for CSRF protection
+    _consume_oauth_state("google", state, oauth_state_cookie, response)
     
     try:
         # Exchange code for user info
@@ -333,12 +391,11 @@ def oauth_google_callback(
 
 
 @router.get('/oauth/linkedin')
-def oauth_linkedin_login():
+def oauth_linkedin_login(response: Response):
     """
     Redirect to LinkedIn OAuth authorization.
     """
-    state = secrets.token_urlsafe(32)
-    # TODO: Store state in session/redis for CSRF protection
+    state = _issue_oauth_state("linkedin", response)
     try:
         auth_url = oauth_service.get_linkedin_auth_url(state)
         return {"auth_url": auth_url}
@@ -352,11 +409,12 @@ def oauth_linkedin_callback(
     state: str,
     request: Request,
     response: Response,
+    oauth_state_cookie: str | None = Cookie(None, alias=OAUTH_STATE_COOKIE),
 ):
     """
     Handle LinkedIn OAuth callback.
     """
-    # TODO: Validate state for CSRF protection
+    _consume_oauth_state("linkedin", state, oauth_state_cookie, response)
     
     try:
         # Exchange code for user info
@@ -1,20 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 import logging
 
-from app.core.dependencies import require_admin
+from app.core.dependencies import require_admin, require_permission
 from app.services.d1_service import database
 from app.models import metadata
-from sqlalchemy import Table, Column, Integer, String, Text, Boolean, DateTime, Float
+from sqlalchemy import Table, Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey, JSON, bindparam, select
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 import json
 
+try:
+    import orjson  # noqa: F401 - ORJSONResponse needs it at render time
+    from fastapi.responses import ORJSONResponse as _ResponseClass
+except ImportError:  # orjson is optional
+    class _ResponseClass(JSONResponse):
+        """JSONResponse that also accepts the datetimes orjson would encode"""
+
+        def render(self, content) -> bytes:
+            return super().render(jsonable_encoder(content))
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# JSONB on PostgreSQL, JSON-encoded TEXT elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+# Sparse SEO fields stored together in blogs.seo instead of one column each
+SEO_FIELDS = (
+    "meta_title",
+    "meta_description",
+    "canonical_url",
+    "og_title",
+    "og_description",
+    "og_image_url",
+    "og_image_alt",
+)
+
+# Category/tag slugs: spaces become hyphens and "&" becomes "and", in one pass
+_SLUG_TRANSLATION = str.maketrans({" ": "-", "&": "and"})
+
+
+@lru_cache(maxsize=1024)
+def _slugify(name: str) -> str:
+    return name.lower().translate(_SLUG_TRANSLATION)
+
+
 # Define blogs table
 blogs = Table(
     "blogs",
@@ -25,18 +64,12 @@ blogs = Table(
     Column("excerpt", Text, nullable=False),
     Column("content", Text, nullable=False),
     Column("author", String, nullable=False),
-    Column("categories", Text, default='[]'),
+    Column("categories", JSONType, default=list),
     Column("tags", Text, default='[]'),
     Column("image_url", String, nullable=True),
     Column("image_alt", String, nullable=True),
     Column("featured", Boolean, default=False),
-    Column("meta_title", String, nullable=True),
-    Column("meta_description", String, nullable=True),
-    Column("canonical_url", String, nullable=True),
-    Column("og_title", String, nullable=True),
-    Column("og_description", String, nullable=True),
-    Column("og_image_url", String, nullable=True),
-    Column("og_image_alt", String, nullable=True),
+    Column("seo", JSONType, default=dict),
     Column("word_count", Integer, default=0),
     Column("reading_time", Float, default=0.0),
     Column("published", Boolean, default=False),
@@ -63,29 +96,13 @@ courses = Table(
     Column("updated_at", DateTime, server_default=func.now(), onupdate=func.now()),
 )
 
-@router.get('/admin/courses', dependencies=[Depends(require_admin)])
+@router.get('/admin/courses', dependencies=[Depends(require_admin)], response_model=None)
 def list_courses(skip: int = 0, limit: int = 100):
     """List all courses."""
-    query = courses.select().offset(skip).limit(limit).order_by(courses.c.created_at.desc())
-    result = database.fetch_all(query)
-    return {
-        "courses": [
-            {
-                "id": c["id"],
-                "title": c["title"],
-                "description": c["description"],
-                "instructor": c["instructor"],
-                "duration": c["duration"],
-                "level": c["level"],
-                "price": c["price"],
-                "category": c["category"],
-                "image_url": c["image_url"],
-                "published": c["published"],
-                "created_at": c["created_at"].isoformat() if c["created_at"] else None,
-            }
-            for c in result
-        ]
-    }
+    # Rows already have the response shape; datetimes are encoded by the
+    # response class instead of per-row isoformat() calls
+    result = database.fetch_all(_COURSE_LIST, {"skip": skip, "limit": limit})
+    return _ResponseClass({"courses": result})
 
 # Define categories table
 categories = Table(
@@ -112,9 +129,78 @@ tags_table = Table(
 blog_tags = Table(
     "blog_tags",
     metadata,
-    Column("blog_id", Integer, nullable=False),
-    Column("tag_id", Integer, nullable=False),
+    Column("blog_id", Integer, ForeignKey("blogs.id", ondelete="CASCADE"), nullable=False),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False),
+)
+
+# Statements built once at import rather than per request; per-request values
+# are bound parameters. Bind names avoid column names so the update
+# statements can still take .values(...) on top.
+_COURSE_BY_ID = courses.select().where(courses.c.id == bindparam("course_id"))
+_PUBLISHED_COURSE_BY_ID = _COURSE_BY_ID.where(courses.c.published == True)
+_PUBLISHED_COURSE_LIST = (
+    courses.select()
+    .where(courses.c.published == True)
+    .order_by(courses.c.created_at.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+# The admin list returns every column except updated_at
+_COURSE_LIST = (
+    select(*(column for column in courses.c if column.name != "updated_at"))
+    .order_by(courses.c.created_at.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+_UPDATE_COURSE = courses.update().where(courses.c.id == bindparam("course_id")).returning(courses.c.id)
+_DELETE_COURSE = courses.delete().where(courses.c.id == bindparam("course_id"))
+
+_BLOG_BY_ID = blogs.select().where(blogs.c.id == bindparam("blog_id"))
+_BLOG_SEO = select(blogs.c.seo).where(blogs.c.id == bindparam("blog_id"))
+_BLOG_BY_SLUG = blogs.select().where(blogs.c.slug == bindparam("blog_slug"))
+_PUBLISHED_BLOG_BY_SLUG = _BLOG_BY_SLUG.where(blogs.c.published == True)
+_SLUG_TAKEN_BY_OTHER = _BLOG_BY_SLUG.where(blogs.c.id != bindparam("blog_id"))
+_PUBLISHED_BLOG_LIST = (
+    blogs.select()
+    .where(blogs.c.published == True)
+    .order_by(blogs.c.created_at.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+# Admin list: the page of blogs (without the denormalized tags column) is
+# picked first so LIMIT counts blogs, then joined to blog_tags for one row
+# per (blog, tag). Ordering by id as well keeps each blog's rows adjacent.
+_BLOG_PAGE = (
+    select(*(column for column in blogs.c if column.name != "tags"))
+    .order_by(blogs.c.created_at.desc())
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+    .subquery("page")
+)
+_BLOG_LIST = (
+    select(_BLOG_PAGE, blog_tags.c.tag_id)
+    .select_from(_BLOG_PAGE.outerjoin(blog_tags, blog_tags.c.blog_id == _BLOG_PAGE.c.id))
+    .order_by(_BLOG_PAGE.c.created_at.desc(), _BLOG_PAGE.c.id)
+)
+_UPDATE_BLOG = (
+    blogs.update()
+    .where(blogs.c.id == bindparam("blog_id"))
+    .returning(blogs.c.id, blogs.c.word_count, blogs.c.reading_time)
 )
+_DELETE_BLOG = blogs.delete().where(blogs.c.id == bindparam("blog_id"))
+
+_INSERT_BLOG_TAG = blog_tags.insert()
+_DELETE_BLOG_TAGS = blog_tags.delete().where(blog_tags.c.blog_id == bindparam("blog_id"))
+
+_CATEGORY_LIST = categories.select().order_by(categories.c.name)
+_UPDATE_CATEGORY = (
+    categories.update().where(categories.c.id == bindparam("category_id")).returning(categories.c.id)
+)
+_DELETE_CATEGORY = categories.delete().where(categories.c.id == bindparam("category_id"))
+
+_TAG_LIST = tags_table.select().order_by(tags_table.c.name)
+_UPDATE_TAG = tags_table.update().where(tags_table.c.id == bindparam("tag_id")).returning(tags_table.c.id)
+_DELETE_TAG = tags_table.delete().where(tags_table.c.id == bindparam("tag_id"))
 
 
 # ===== Request/Response Models =====
@@ -202,7 +288,7 @@ class BlogUpdate(BaseModel):
     og_image_url: Optional[str] = None
 
 
-@router.post('/admin/courses', dependencies=[Depends(require_admin)])
+@router.post('/admin/courses', dependencies=[Depends(require_permission("create_course"))])
 def create_course(payload: CourseCreate):
     """Create a new course."""
     query = courses.insert().values(
@@ -220,99 +306,84 @@ def create_course(payload: CourseCreate):
     return {"id": course_id, "message": "Course created successfully"}
 
 
-@router.get('/admin/courses/{course_id}', dependencies=[Depends(require_admin)])
+@router.get('/admin/courses/{course_id}', dependencies=[Depends(require_permission("edit_course"))])
 def get_course(course_id: int):
     """Get a specific course."""
-    query = courses.select().where(courses.c.id == course_id)
-    course = database.fetch_one(query)
+    course = database.fetch_one(_COURSE_BY_ID, {"course_id": course_id})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     return dict(course)
 
 
-@router.put('/admin/courses/{course_id}', dependencies=[Depends(require_admin)])
+@router.put('/admin/courses/{course_id}', dependencies=[Depends(require_permission("edit_course"))])
 def update_course(course_id: int, payload: CourseUpdate):
     """Update a course."""
-    # Check if course exists
-    check_query = courses.select().where(courses.c.id == course_id)
-    existing = database.fetch_one(check_query)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
     # Build update values
     update_values = {k: v for k, v in payload.dict(exclude_unset=True).items() if v is not None}
     if not update_values:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    query = courses.update().where(courses.c.id == course_id).values(**update_values)
-    database.execute(query)
+    # Existence check and update in one round trip
+    query = _UPDATE_COURSE.values(**update_values)
+    if database.execute_returning(query, {"course_id": course_id}) is None:
+        raise HTTPException(status_code=404, detail="Course not found")
     return {"message": "Course updated successfully"}
 
 
 @router.delete('/admin/courses/{course_id}', dependencies=[Depends(require_admin)])
 def delete_course(course_id: int):
     """Delete a course."""
-    query = courses.delete().where(courses.c.id == course_id)
-    database.execute(query)
+    database.execute(_DELETE_COURSE, {"course_id": course_id})
     return {"message": "Course deleted successfully"}
 
 
 # ===== Blog Management =====
 
-@router.get('/admin/blogs', dependencies=[Depends(require_admin)])
+def _json_list(value) -> list:
+    """Return a JSON array column as a list, accepting legacy JSON-encoded text."""
+    if isinstance(value, list):
+        return value
+    try:
+        return json.loads(value) if value else []
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+
+def _seo_fields(seo) -> dict:
+    """Flatten the blogs.seo document back into the per-field API shape."""
+    if isinstance(seo, str):
+        try:
+            seo = json.loads(seo)
+        except json.JSONDecodeError:
+            seo = None
+    seo = seo or {}
+    return {field: seo.get(field) for field in SEO_FIELDS}
+
+
+@router.get('/admin/blogs', dependencies=[Depends(require_admin)], response_model=None)
 def list_blogs(
     skip: int = 0,
     limit: int = 100,
 ):
     """List all blog posts."""
     try:
-        query = blogs.select().offset(skip).limit(limit).order_by(blogs.c.created_at.desc())
-        result = database.fetch_all(query)
+        rows = database.fetch_all(_BLOG_LIST, {"skip": skip, "limit": limit})
         
-        blogs_list = []
-        for b in result:
-            # Safely parse JSON fields
-            try:
-                categories = json.loads(b.get("categories")) if b.get("categories") and b.get("categories") != "" else []
-            except (json.JSONDecodeError, TypeError):
-                categories = []
-            
-            try:
-                tags = json.loads(b.get("tags")) if b.get("tags") and b.get("tags") != "" else []
-            except (json.JSONDecodeError, TypeError):
-                tags = []
-            
-            blog_dict = {
-                "id": b["id"],
-                "title": b["title"],
-                "slug": b.get("slug", ""),
-                "excerpt": b.get("excerpt", ""),
-                "content": b.get("content", ""),
-                "author": b.get("author", ""),
-                "category": b.get("category", ""),
-                "categories": categories,
-                "tags": tags,
-                "image_url": b.get("image_url"),
-                "image_alt": b.get("image_alt"),
-                "featured": b.get("featured", False),
-                "meta_title": b.get("meta_title"),
-                "meta_description": b.get("meta_description"),
-                "canonical_url": b.get("canonical_url"),
-                "og_title": b.get("og_title"),
-                "og_description": b.get("og_description"),
-                "og_image_url": b.get("og_image_url"),
-                "og_image_alt": b.get("og_image_alt"),
-                "word_count": b.get("word_count", 0),
-                "reading_time": b.get("reading_time", 0.0),
-                "published": b.get("published", False),
-                "publish_at": b["publish_at"].isoformat() if b.get("publish_at") else None,
-                "created_at": b["created_at"].isoformat() if b.get("created_at") else None,
-                "updated_at": b["updated_at"].isoformat() if b.get("updated_at") else None,
-            }
-            
-            blogs_list.append(blog_dict)
+        # One row per (blog, tag); fold each blog's rows into its tag list.
+        # Only categories and the SEO document need reshaping, datetimes are
+        # encoded by the response class.
+        result = []
+        for _, group in groupby(rows, key=itemgetter("id")):
+            b = next(group)
+            tag_id = b.pop("tag_id")
+            b["tags"] = [] if tag_id is None else [tag_id]
+            b["tags"].extend(row["tag_id"] for row in group)
+            b["categories"] = _json_list(b["categories"])
+            b["category"] = ""
+            b.update(_seo_fields(b.pop("seo")))
+            result.append(b)
         
-        return {"blogs": blogs_list}
+        return _ResponseClass({"blogs": result})
     except Exception as e:
         logger.error(f"Error listing blogs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching blogs: {str(e)}")
@@ -327,7 +398,7 @@ def create_blog(payload: BlogCreate):
             raise HTTPException(status_code=400, detail="Publish date must be in the future")
 
         # Slug uniqueness check
-        existing_slug = database.fetch_one(blogs.select().where(blogs.c.slug == payload.slug))
+        existing_slug = database.fetch_one(_BLOG_BY_SLUG, {"blog_slug": payload.slug})
         if existing_slug:
             raise HTTPException(status_code=400, detail="Slug already exists. Please choose a unique slug.")
 
@@ -343,18 +414,12 @@ def create_blog(payload: BlogCreate):
             excerpt=payload.excerpt,
             content=payload.content,
             author=payload.author,
-            categories=json.dumps(payload.categories or []),
+            categories=payload.categories or [],
             tags=json.dumps(payload.tags or []),
             image_url=payload.image_url,
             image_alt=payload.image_alt,
             featured=payload.featured,
-            meta_title=payload.meta_title,
-            meta_description=payload.meta_description,
-            canonical_url=payload.canonical_url,
-            og_title=payload.og_title,
-            og_description=payload.og_description,
-            og_image_url=payload.og_image_url,
-            og_image_alt=payload.og_image_alt,
+            seo={field: getattr(payload, field) for field in SEO_FIELDS if getattr(payload, field) is not None},
             word_count=word_count,
             reading_time=reading_time,
             published=payload.published,
@@ -364,10 +429,10 @@ def create_blog(payload: BlogCreate):
 
         # Insert blog-tag relationships
         if payload.tags:
-            for tag_id in payload.tags:
-                database.execute(
-                    blog_tags.insert().values(blog_id=blog_id, tag_id=tag_id)
-                )
+            database.execute_many(
+                _INSERT_BLOG_TAG,
+                [{"blog_id": blog_id, "tag_id": tag_id} for tag_id in payload.tags],
+            )
 
         return {"id": blog_id, "message": "Blog post created successfully", "word_count": word_count, "reading_time": reading_time}
     except HTTPException:
@@ -380,72 +445,82 @@ def create_blog(payload: BlogCreate):
 @router.get('/admin/blogs/{blog_id}', dependencies=[Depends(require_admin)])
 def get_blog(blog_id: int):
     """Get a specific blog post."""
-    query = blogs.select().where(blogs.c.id == blog_id)
-    blog = database.fetch_one(query)
+    blog = database.fetch_one(_BLOG_BY_ID, {"blog_id": blog_id})
     if not blog:
         raise HTTPException(status_code=404, detail="Blog post not found")
-    return dict(blog)
+    blog = dict(blog)
+    blog.update(_seo_fields(blog.pop("seo", None)))
+    return blog
 
 
 @router.put('/admin/blogs/{blog_id}', dependencies=[Depends(require_admin)])
 def update_blog(blog_id: int, payload: BlogUpdate):
     """Update a blog post."""
-    # Check if blog exists
-    check_query = blogs.select().where(blogs.c.id == blog_id)
-    existing = database.fetch_one(check_query)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Blog post not found")
-
     # Validate publish_at is in the future if provided
     if payload.publish_at and payload.publish_at <= datetime.utcnow():
         raise HTTPException(status_code=400, detail="Publish date must be in the future")
 
     # Slug uniqueness check (if updating slug)
     if payload.slug:
-        existing_slug = database.fetch_one(blogs.select().where(blogs.c.slug == payload.slug).where(blogs.c.id != blog_id))
+        existing_slug = database.fetch_one(
+            _SLUG_TAKEN_BY_OTHER, {"blog_slug": payload.slug, "blog_id": blog_id}
+        )
         if existing_slug:
             raise HTTPException(status_code=400, detail="Slug already exists. Please choose a unique slug.")
 
-    # Word count and reading time
-    import re
-    text_content = re.sub('<[^<]+?>', '', payload.content or existing.get('content', ''))
-    word_count = len(text_content.split())
-    reading_time = round(word_count / 200, 2)
-
     # Build update values
     update_values = {}
+    seo_updates = {}
     for k, v in payload.dict(exclude_unset=True).items():
         if k == 'tags' and v is not None:
             update_values['tags'] = json.dumps(v)
-            # Update blog_tags junction table
-            database.execute(blog_tags.delete().where(blog_tags.c.blog_id == blog_id))
-            for tag_id in v:
-                database.execute(
-                    blog_tags.insert().values(blog_id=blog_id, tag_id=tag_id)
-                )
         elif k == 'categories' and v is not None:
-            update_values['categories'] = json.dumps(v)
+            update_values['categories'] = v
+        elif k in SEO_FIELDS and v is not None:
+            seo_updates[k] = v
         elif v is not None:
             update_values[k] = v
-    update_values['word_count'] = word_count
-    update_values['reading_time'] = reading_time
 
-    if not update_values:
+    if not update_values and not seo_updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    query = blogs.update().where(blogs.c.id == blog_id).values(**update_values)
-    database.execute(query)
-    return {"message": "Blog post updated successfully", "word_count": word_count, "reading_time": reading_time}
+    # Word count and reading time only change with the content
+    if payload.content:
+        import re
+        text_content = re.sub('<[^<]+?>', '', payload.content)
+        update_values['word_count'] = len(text_content.split())
+        update_values['reading_time'] = round(update_values['word_count'] / 200, 2)
+
+    if seo_updates:
+        # SEO fields are merged into the stored blob, so read it first
+        existing = database.fetch_one(_BLOG_SEO, {"blog_id": blog_id})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Blog post not found")
+        update_values['seo'] = {**(existing['seo'] or {}), **seo_updates}
+
+    # Existence check and update in one round trip
+    row = database.execute_returning(_UPDATE_BLOG.values(**update_values), {"blog_id": blog_id})
+    if row is None:
+        raise HTTPException(status_code=404, detail="Blog post not found")
+
+    if payload.tags is not None:
+        # Rewrite the blog_tags junction rows in one transaction so
+        # readers never see the blog with no tags in between
+        with database.transaction() as connection:
+            connection.execute(_DELETE_BLOG_TAGS, {"blog_id": blog_id})
+            if payload.tags:
+                connection.execute(
+                    _INSERT_BLOG_TAG,
+                    [{"blog_id": blog_id, "tag_id": tag_id} for tag_id in payload.tags],
+                )
+    return {"message": "Blog post updated successfully", "word_count": row["word_count"], "reading_time": row["reading_time"]}
 
 
 @router.delete('/admin/blogs/{blog_id}', dependencies=[Depends(require_admin)])
 def delete_blog(blog_id: int):
     """Delete a blog post."""
-    # Delete associated blog-tag relationships first
-    database.execute(blog_tags.delete().where(blog_tags.c.blog_id == blog_id))
-    # Delete the blog
-    query = blogs.delete().where(blogs.c.id == blog_id)
-    database.execute(query)
+    # blog_tags rows go with it (ON DELETE CASCADE)
+    database.execute(_DELETE_BLOG, {"blog_id": blog_id})
     return {"message": "Blog post deleted successfully"}
 
 
@@ -454,8 +529,7 @@ def delete_blog(blog_id: int):
 @router.get('/admin/categories', dependencies=[Depends(require_admin)])
 def list_categories():
     """List all categories."""
-    query = categories.select().order_by(categories.c.name)
-    result = database.fetch_all(query)
+    result = database.fetch_all(_CATEGORY_LIST)
     return {
         "categories": [
             {
@@ -474,7 +548,7 @@ def list_categories():
 def create_category(payload: CategoryCreate):
     """Create a new category."""
     # Generate slug from name
-    slug = payload.name.lower().replace(' ', '-').replace('&', 'and')
+    slug = _slugify(payload.name)
     
     try:
         query = categories.insert().values(
@@ -491,31 +565,26 @@ def create_category(payload: CategoryCreate):
 @router.put('/admin/categories/{category_id}', dependencies=[Depends(require_admin)])
 def update_category(category_id: int, payload: CategoryUpdate):
     """Update a category."""
-    check_query = categories.select().where(categories.c.id == category_id)
-    existing = database.fetch_one(check_query)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
     update_values = {}
     for k, v in payload.dict(exclude_unset=True).items():
         if v is not None:
             update_values[k] = v
             if k == 'name':
-                update_values['slug'] = v.lower().replace(' ', '-').replace('&', 'and')
+                update_values['slug'] = _slugify(v)
     
     if not update_values:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    query = categories.update().where(categories.c.id == category_id).values(**update_values)
-    database.execute(query)
+    query = _UPDATE_CATEGORY.values(**update_values)
+    if database.execute_returning(query, {"category_id": category_id}) is None:
+        raise HTTPException(status_code=404, detail="Category not found")
     return {"message": "Category updated successfully"}
 
 
 @router.delete('/admin/categories/{category_id}', dependencies=[Depends(require_admin)])
 def delete_category(category_id: int):
     """Delete a category."""
-    query = categories.delete().where(categories.c.id == category_id)
-    database.execute(query)
+    database.execute(_DELETE_CATEGORY, {"category_id": category_id})
     return {"message": "Category deleted successfully"}
 
 
@@ -524,8 +593,7 @@ def delete_category(category_id: int):
 @router.get('/admin/tags', dependencies=[Depends(require_admin)])
 def list_tags():
     """List all tags."""
-    query = tags_table.select().order_by(tags_table.c.name)
-    result = database.fetch_all(query)
+    result = database.fetch_all(_TAG_LIST)
     return {
         "tags": [
             {
@@ -543,7 +611,7 @@ def list_tags():
 def create_tag(payload: TagCreate):
     """Create a new tag."""
     # Generate slug from name
-    slug = payload.name.lower().replace(' ', '-').replace('&', 'and')
+    slug = _slugify(payload.name)
     
     try:
         query = tags_table.insert().values(
@@ -559,31 +627,21 @@ def create_tag(payload: TagCreate):
 @router.put('/admin/tags/{tag_id}', dependencies=[Depends(require_admin)])
 def update_tag(tag_id: int, payload: TagUpdate):
     """Update a tag."""
-    check_query = tags_table.select().where(tags_table.c.id == tag_id)
-    existing = database.fetch_one(check_query)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Tag not found")
-    
     if not payload.name:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    slug = payload.name.lower().replace(' ', '-').replace('&', 'and')
-    query = tags_table.update().where(tags_table.c.id == tag_id).values(
-        name=payload.name,
-        slug=slug
-    )
-    database.execute(query)
+    slug = _slugify(payload.name)
+    query = _UPDATE_TAG.values(name=payload.name, slug=slug)
+    if database.execute_returning(query, {"tag_id": tag_id}) is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
     return {"message": "Tag updated successfully"}
 
 
 @router.delete('/admin/tags/{tag_id}', dependencies=[Depends(require_admin)])
 def delete_tag(tag_id: int):
     """Delete a tag."""
-    # Delete associated blog-tag relationships first
-    database.execute(blog_tags.delete().where(blog_tags.c.tag_id == tag_id))
-    # Delete the tag
-    query = tags_table.delete().where(tags_table.c.id == tag_id)
-    database.execute(query)
+    # blog_tags rows go with it (ON DELETE CASCADE)
+    database.execute(_DELETE_TAG, {"tag_id": tag_id})
     return {"message": "Tag deleted successfully"}
 
 
@@ -596,16 +654,12 @@ def get_public_blogs(
 ):
     """Get published blogs for public display."""
     try:
-        query = blogs.select().where(blogs.c.published == True).offset(offset).limit(limit).order_by(blogs.c.created_at.desc())
-        result = database.fetch_all(query)
+        result = database.fetch_all(_PUBLISHED_BLOG_LIST, {"skip": offset, "limit": limit})
         
         blogs_list = []
         for b in result:
             # Safely parse JSON fields
-            try:
-                categories = json.loads(b.get("categories")) if b.get("categories") and b.get("categories") != "" else []
-            except (json.JSONDecodeError, TypeError):
-                categories = []
+            categories = _json_list(b.get("categories"))
             
             try:
                 tags = json.loads(b.get("tags")) if b.get("tags") and b.get("tags") != "" else []
@@ -625,13 +679,7 @@ def get_public_blogs(
                 "image_url": b.get("image_url"),
                 "image_alt": b.get("image_alt"),
                 "featured": b.get("featured", False),
-                "meta_title": b.get("meta_title"),
-                "meta_description": b.get("meta_description"),
-                "canonical_url": b.get("canonical_url"),
-                "og_title": b.get("og_title"),
-                "og_description": b.get("og_description"),
-                "og_image_url": b.get("og_image_url"),
-                "og_image_alt": b.get("og_image_alt"),
+                **_seo_fields(b.get("seo")),
                 "word_count": b.get("word_count", 0),
                 "reading_time": b.get("reading_time", 0.0),
                 "published": b.get("published", False),
@@ -654,8 +702,7 @@ def get_public_blogs(
 def get_public_blog_by_slug(slug: str):
     """Get a single published blog by slug."""
     try:
-        query = blogs.select().where(blogs.c.slug == slug).where(blogs.c.published == True)
-        result = database.fetch_one(query)
+        result = database.fetch_one(_PUBLISHED_BLOG_BY_SLUG, {"blog_slug": slug})
         
         if not result:
             raise HTTPException(status_code=404, detail="Blog post not found")
@@ -663,10 +710,7 @@ def get_public_blog_by_slug(slug: str):
         b = result
         
         # Safely parse JSON fields
-        try:
-            categories = json.loads(b.get("categories")) if b.get("categories") and b.get("categories") != "" else []
-        except (json.JSONDecodeError, TypeError):
-            categories = []
+        categories = _json_list(b.get("categories"))
         
         try:
             tags = json.loads(b.get("tags")) if b.get("tags") and b.get("tags") != "" else []
@@ -686,13 +730,7 @@ def get_public_blog_by_slug(slug: str):
             "image_url": b.get("image_url"),
             "image_alt": b.get("image_alt"),
             "featured": b.get("featured", False),
-            "meta_title": b.get("meta_title"),
-            "meta_description": b.get("meta_description"),
-            "canonical_url": b.get("canonical_url"),
-            "og_title": b.get("og_title"),
-            "og_description": b.get("og_description"),
-            "og_image_url": b.get("og_image_url"),
-            "og_image_alt": b.get("og_image_alt"),
+            **_seo_fields(b.get("seo")),
             "word_count": b.get("word_count", 0),
             "reading_time": b.get("reading_time", 0.0),
             "published": b.get("published", False),
@@ -714,8 +752,7 @@ def get_public_courses(
     offset: int = 0,
 ):
     """Get published courses for public display."""
-    query = courses.select().where(courses.c.published == True).offset(offset).limit(limit).order_by(courses.c.created_at.desc())
-    result = database.fetch_all(query)
+    result = database.fetch_all(_PUBLISHED_COURSE_LIST, {"skip": offset, "limit": limit})
     
     courses_list = []
     for c in result:
@@ -745,8 +782,7 @@ def get_public_courses(
 @router.get('/public/courses/{course_id}')
 def get_public_course(course_id: int):
     """Get a single published course."""
-    query = courses.select().where(courses.c.id == course_id).where(courses.c.published == True)
-    result = database.fetch_one(query)
+    result = database.fetch_one(_PUBLISHED_COURSE_BY_ID, {"course_id": course_id})
     
     if not result:
         raise HTTPException(status_code=404, detail="Course not found")
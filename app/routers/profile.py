@@ -4,7 +4,7 @@ from typing import Optional
 from datetime import datetime
 import logging
 
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, invalidate_user
 from app.services.d1_service import database
 from app.core.security import hash_password, verify_password
 from app.models import users
@@ -81,6 +81,7 @@ def update_profile(
         
         query = users.update().where(users.c.id == current_user["id"]).values(**update_data)
         database.execute(query)
+        invalidate_user(current_user["id"])
         
         # Log audit event
         audit_service.log(
@@ -148,6 +149,7 @@ def change_password(
             updated_at=datetime.utcnow()
         )
         database.execute(update_query)
+        invalidate_user(current_user["id"])
         
         # Log audit event
         audit_service.log(
@@ -202,6 +204,7 @@ def change_email(
             updated_at=datetime.utcnow()
         )
         database.execute(update_query)
+        invalidate_user(current_user["id"])
         
         # Log audit event
         audit_service.log(
@@ -248,6 +251,7 @@ def delete_account(
             updated_at=datetime.utcnow()
         )
         database.execute(update_query)
+        invalidate_user(current_user["id"])
         
         # Log audit event
         audit_service.log(
@@ -1,22 +1,104 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy import func, and_, or_, desc, insert, cast, case, BigInteger, MetaData
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 import json
-from app.orm_models.analytics import APIAnalytics
+from app.orm_models.analytics import APIAnalytics, APIAnalyticsPayload
+from app.config.settings import settings
+
+try:
+    import orjson
+
+    def _json_dumps(data) -> str:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:  # orjson is optional
+    _json_dumps = json.dumps
+
+
+# Latency is stored as integer microseconds; stats are reported in ms
+RESPONSE_TIME_MS = APIAnalytics.response_time_us / 1000.0
+
+# Each row stands for sample_rate requests (fast successes are sampled under
+# load), so request counts and mean latency are weighted by it
+REQUEST_COUNT = func.sum(APIAnalytics.sample_rate)
+AVG_RESPONSE_TIME_MS = (
+    func.sum(cast(APIAnalytics.response_time_us, BigInteger) * APIAnalytics.sample_rate) / 1000.0
+) / REQUEST_COUNT
+
+
+# Same columns as api_analytics (see the add_api_analytics_staging migration)
+_staging_table = APIAnalytics.__table__.to_metadata(MetaData(), name="api_analytics_staging")
+
+
+def _insert_returning_keys(target):
+    return insert(target).returning(target.c.id, target.c.created_at, sort_by_parameter_order=True)
+
+
+# Batch INSERT statements built once at import, plus a dedicated compiled
+# cache, so each flush reuses the compiled SQL instead of rebuilding the
+# statement and recomputing its cache key
+_ANALYTICS_INSERT = _insert_returning_keys(APIAnalytics.__table__)
+_STAGING_INSERT = _insert_returning_keys(_staging_table)
+_PAYLOAD_INSERT = insert(APIAnalyticsPayload.__table__)
+_INSERT_OPTIONS = {"compiled_cache": {}}
+
+
+def _overview_columns() -> list:
+    """Aggregates behind the overview stats, weighted by sample_rate"""
+    return [
+        REQUEST_COUNT.label("total_requests"),
+        AVG_RESPONSE_TIME_MS.label("avg_response_time"),
+        # Success (2xx and 3xx status codes) and error (4xx and 5xx) counts
+        func.sum(
+            case((APIAnalytics.status_code.between(200, 399), APIAnalytics.sample_rate), else_=0)
+        ).label("successful_requests"),
+        func.sum(
+            case((APIAnalytics.status_code >= 400, APIAnalytics.sample_rate), else_=0)
+        ).label("error_requests"),
+        # COUNT(DISTINCT ...) skips NULL users and IPs
+        func.count(func.distinct(APIAnalytics.user_id)).label("unique_users"),
+        func.count(func.distinct(APIAnalytics.ip_address)).label("unique_ips"),
+    ]
+
+
+def _overview_stats(row, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+    """Build the overview stats dict from a row of _overview_columns (None if no rows)"""
+    total_requests = (row.total_requests if row else 0) or 0
+    avg_response_time = (row.avg_response_time if row else 0) or 0
+    successful_requests = (row.successful_requests if row else 0) or 0
+    error_requests = (row.error_requests if row else 0) or 0
+
+    success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
+    error_rate = (error_requests / total_requests * 100) if total_requests > 0 else 0
+
+    # Requests per minute (throughput)
+    time_diff_minutes = (end_date - start_date).total_seconds() / 60
+    requests_per_minute = total_requests / time_diff_minutes if time_diff_minutes > 0 else 0
+
+    return {
+        "total_requests": total_requests,
+        "avg_response_time": round(avg_response_time, 2),
+        "success_rate": round(success_rate, 2),
+        "error_rate": round(error_rate, 2),
+        "requests_per_minute": round(requests_per_minute, 2),
+        "unique_users": (row.unique_users if row else 0) or 0,
+        "unique_ips": (row.unique_ips if row else 0) or 0,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+    }
 
 
 class AnalyticsService:
     """Service for API analytics operations"""
 
     @staticmethod
-    async def log_api_call(
-        db: Session,
+    def _build_row(
         endpoint: str,
         method: str,
         path: str,
         status_code: int,
-        response_time: float,
+        response_time_us: int,
+        sample_rate: int = 1,
         user_id: Optional[int] = None,
         ip_address: Optional[str] = None,
         city: Optional[str] = None,
@@ -32,45 +114,124 @@ class AnalyticsService:
         error_message: Optional[str] = None,
         user_agent: Optional[str] = None,
         referer: Optional[str] = None,
-    ) -> APIAnalytics:
-        """Log an API call to the analytics database"""
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Build the api_analytics row and, if there is any request/response
+        data, the matching api_analytics_payloads row for a single API call
+        """
         
-        # Limit body sizes to prevent database bloat
+        # Limit body sizes to prevent database bloat; oversized documents are
+        # replaced by a truncated text preview so the value stays valid JSON
         def truncate_json(data, max_length=5000):
             if data:
-                json_str = json.dumps(data)
-                return json_str[:max_length] if len(json_str) > max_length else json_str
+                json_str = _json_dumps(data)
+                if len(json_str) > max_length:
+                    return {"truncated": True, "preview": json_str[:max_length]}
+                return data
             return None
 
-        analytics_entry = APIAnalytics(
-            endpoint=endpoint,
-            method=method,
-            path=path,
-            query_params=json.dumps(query_params) if query_params else None,
-            status_code=status_code,
-            response_time=response_time,
-            user_id=user_id,
-            ip_address=ip_address,
-            city=city,
-            region=region,
-            country=country,
-            country_code=country_code,
-            latitude=latitude,
-            longitude=longitude,
-            request_headers=truncate_json(request_headers),
-            request_body=truncate_json(request_body),
-            response_body=truncate_json(response_body),
-            error_message=error_message,
-            user_agent=user_agent,
-            referer=referer,
-        )
+        row = {
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "status_code": status_code,
+            "response_time_us": response_time_us,
+            "sample_rate": sample_rate,
+            "user_id": user_id,
+            "ip_address": ip_address,
+            "city": city,
+            "region": region,
+            "country": country,
+            "country_code": country_code,
+            "latitude": latitude,
+            "longitude": longitude,
+            "created_at": datetime.utcnow(),
+        }
+
+        payload = {
+            "query_params": query_params or None,
+            "request_headers": truncate_json(request_headers),
+            "request_body": truncate_json(request_body),
+            "response_body": truncate_json(response_body),
+            "error_message": error_message,
+            "user_agent": user_agent,
+            "referer": referer,
+        }
+        if not any(value is not None for value in payload.values()):
+            payload = None
+        
+        return row, payload
+
+    @staticmethod
+    async def log_api_call(db: Session, **kwargs) -> APIAnalytics:
+        """Log an API call to the analytics database"""
+        row, payload = AnalyticsService._build_row(**kwargs)
+        analytics_entry = APIAnalytics(**row)
         
         db.add(analytics_entry)
+        db.flush()
+        if payload is not None:
+            db.add(APIAnalyticsPayload(
+                analytics_id=analytics_entry.id,
+                created_at=analytics_entry.created_at,
+                **payload,
+            ))
         db.commit()
         db.refresh(analytics_entry)
         
         return analytics_entry
 
+    @staticmethod
+    def log_api_calls(db: Session, calls: List[Dict[str, Any]]) -> int:
+        """
+        Log a batch of API calls with a single executemany INSERT
+        
+        Synchronous so callers on the event loop can run it in a worker
+        thread (asyncio.to_thread) instead of blocking the loop on I/O.
+        
+        On PostgreSQL the engine is configured with executemany_mode
+        'values_plus_batch', so the batch is sent as multi-row
+        INSERT ... VALUES pages via psycopg2's execute_values. When the
+        engine runs on psycopg3 (postgresql+psycopg://) the flush is
+        wrapped in libpq pipeline mode so the pages go out without waiting
+        on a round trip each. Payload rows are written the same way, keyed
+        by the ids RETURNING gives back for the analytics rows.
+        
+        With ANALYTICS_STAGING on PostgreSQL, rows go to the UNLOGGED
+        api_analytics_staging table instead and are moved into the
+        partitioned table by the staging flusher the app starts at startup
+        (app.tasks.analytics_staging).
+        """
+        if not calls:
+            return 0
+
+        built = [AnalyticsService._build_row(**call) for call in calls]
+        rows = [row for row, _ in built]
+        
+        statement = _ANALYTICS_INSERT
+        if settings.ANALYTICS_STAGING and db.get_bind().dialect.name == "postgresql":
+            statement = _STAGING_INSERT
+
+        def write():
+            inserted = db.execute(statement, rows, execution_options=_INSERT_OPTIONS).all()
+            payloads = [
+                {"analytics_id": analytics_id, "created_at": created_at, **payload}
+                for (analytics_id, created_at), (_, payload) in zip(inserted, built)
+                if payload is not None
+            ]
+            if payloads:
+                db.execute(_PAYLOAD_INSERT, payloads, execution_options=_INSERT_OPTIONS)
+
+        driver_connection = db.connection().connection.driver_connection
+        if hasattr(driver_connection, "pipeline"):
+            with driver_connection.pipeline():
+                write()
+        else:
+            write()
+        db.commit()
+        
+        return len(rows)
+
     @staticmethod
     async def get_overview_stats(
         db: Session,
@@ -84,56 +245,39 @@ class AnalyticsService:
         if not end_date:
             end_date = datetime.utcnow()
 
-        query = db.query(APIAnalytics).filter(
+        # All overview aggregates in one pass over the range
+        row = db.query(*_overview_columns()).filter(
             APIAnalytics.created_at.between(start_date, end_date)
-        )
+        ).one()
 
-        total_requests = query.count()
-        avg_response_time = query.with_entities(
-            func.avg(APIAnalytics.response_time)
-        ).scalar() or 0
-
-        # Success rate (2xx and 3xx status codes)
-        successful_requests = query.filter(
-            APIAnalytics.status_code.between(200, 399)
-        ).count()
-        success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
-
-        # Error rate (4xx and 5xx status codes)
-        error_requests = query.filter(
-            APIAnalytics.status_code >= 400
-        ).count()
-        error_rate = (error_requests / total_requests * 100) if total_requests > 0 else 0
-
-        # Requests per minute (throughput)
-        time_diff_minutes = (end_date - start_date).total_seconds() / 60
-        requests_per_minute = total_requests / time_diff_minutes if time_diff_minutes > 0 else 0
-
-        # Unique users
-        unique_users = query.filter(
-            APIAnalytics.user_id.isnot(None)
-        ).with_entities(
-            func.count(func.distinct(APIAnalytics.user_id))
-        ).scalar() or 0
-
-        # Unique IPs
-        unique_ips = query.filter(
-            APIAnalytics.ip_address.isnot(None)
-        ).with_entities(
-            func.count(func.distinct(APIAnalytics.ip_address))
-        ).scalar() or 0
+        return _overview_stats(row, start_date, end_date)
 
-        return {
-            "total_requests": total_requests,
-            "avg_response_time": round(avg_response_time, 2),
-            "success_rate": round(success_rate, 2),
-            "error_rate": round(error_rate, 2),
-            "requests_per_minute": round(requests_per_minute, 2),
-            "unique_users": unique_users,
-            "unique_ips": unique_ips,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-        }
+    @staticmethod
+    async def get_comparison_stats(
+        db: Session,
+        previous_start: datetime,
+        current_start: datetime,
+        end_date: datetime,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Overview statistics for the current period (current_start to
+        end_date) and the previous one (previous_start to current_start),
+        computed in a single scan grouped by period
+        """
+        period = case(
+            (APIAnalytics.created_at >= current_start, "current"),
+            else_="previous",
+        ).label("period")
+
+        rows = db.query(period, *_overview_columns()).filter(
+            APIAnalytics.created_at.between(previous_start, end_date)
+        ).group_by(period).all()
+        by_period = {row.period: row for row in rows}
+
+        return (
+            _overview_stats(by_period.get("current"), current_start, end_date),
+            _overview_stats(by_period.get("previous"), previous_start, current_start),
+        )
 
     @staticmethod
     async def get_endpoint_stats(
@@ -152,12 +296,12 @@ class AnalyticsService:
         results = db.query(
             APIAnalytics.endpoint,
             APIAnalytics.method,
-            func.count(APIAnalytics.id).label('request_count'),
-            func.avg(APIAnalytics.response_time).label('avg_response_time'),
-            func.min(APIAnalytics.response_time).label('min_response_time'),
-            func.max(APIAnalytics.response_time).label('max_response_time'),
+            REQUEST_COUNT.label('request_count'),
+            AVG_RESPONSE_TIME_MS.label('avg_response_time'),
+            func.min(RESPONSE_TIME_MS).label('min_response_time'),
+            func.max(RESPONSE_TIME_MS).label('max_response_time'),
             func.sum(
-                func.case((APIAnalytics.status_code.between(200, 399), 1), else_=0)
+                func.case((APIAnalytics.status_code.between(200, 399), APIAnalytics.sample_rate), else_=0)
             ).label('success_count'),
             func.sum(
                 func.case((APIAnalytics.status_code >= 400, 1), else_=0)
@@ -207,8 +351,8 @@ class AnalyticsService:
         country_results = db.query(
             APIAnalytics.country,
             APIAnalytics.country_code,
-            func.count(APIAnalytics.id).label('request_count'),
-            func.avg(APIAnalytics.response_time).label('avg_response_time'),
+            REQUEST_COUNT.label('request_count'),
+            AVG_RESPONSE_TIME_MS.label('avg_response_time'),
         ).filter(
             and_(
                 APIAnalytics.created_at.between(start_date, end_date),
@@ -228,8 +372,8 @@ class AnalyticsService:
             APIAnalytics.country,
             APIAnalytics.latitude,
             APIAnalytics.longitude,
-            func.count(APIAnalytics.id).label('request_count'),
-            func.avg(APIAnalytics.response_time).label('avg_response_time'),
+            REQUEST_COUNT.label('request_count'),
+            AVG_RESPONSE_TIME_MS.label('avg_response_time'),
         ).filter(
             and_(
                 APIAnalytics.created_at.between(start_date, end_date),
@@ -249,7 +393,7 @@ class AnalyticsService:
             "countries": [
                 {
                     "country": r.country,
-                    "country_code": r.country_code,
+                    "country_code": r.country_code or None,
                     "request_count": r.request_count,
                     "avg_response_time": round(r.avg_response_time, 2),
                 }
@@ -293,10 +437,10 @@ class AnalyticsService:
 
         results = db.query(
             time_format.label('time_bucket'),
-            func.count(APIAnalytics.id).label('request_count'),
-            func.avg(APIAnalytics.response_time).label('avg_response_time'),
+            REQUEST_COUNT.label('request_count'),
+            AVG_RESPONSE_TIME_MS.label('avg_response_time'),
             func.sum(
-                func.case((APIAnalytics.status_code.between(200, 399), 1), else_=0)
+                func.case((APIAnalytics.status_code.between(200, 399), APIAnalytics.sample_rate), else_=0)
             ).label('success_count'),
             func.sum(
                 func.case((APIAnalytics.status_code >= 400, 1), else_=0)
@@ -373,7 +517,22 @@ class AnalyticsService:
         ).limit(limit).all()
 
         # Recent errors with details
-        recent_errors = db.query(APIAnalytics).filter(
+        recent_errors = db.query(
+            APIAnalytics.id,
+            APIAnalytics.endpoint,
+            APIAnalytics.method,
+            APIAnalytics.status_code,
+            APIAnalytics.user_id,
+            APIAnalytics.ip_address,
+            APIAnalytics.created_at,
+            APIAnalyticsPayload.error_message,
+        ).outerjoin(
+            APIAnalyticsPayload,
+            and_(
+                APIAnalyticsPayload.analytics_id == APIAnalytics.id,
+                APIAnalyticsPayload.created_at == APIAnalytics.created_at,
+            )
+        ).filter(
             and_(
                 APIAnalytics.created_at.between(start_date, end_date),
                 APIAnalytics.status_code >= 400
@@ -431,9 +590,9 @@ class AnalyticsService:
         results = db.query(
             APIAnalytics.endpoint,
             APIAnalytics.method,
-            func.avg(APIAnalytics.response_time).label('avg_response_time'),
-            func.max(APIAnalytics.response_time).label('max_response_time'),
-            func.count(APIAnalytics.id).label('request_count'),
+            AVG_RESPONSE_TIME_MS.label('avg_response_time'),
+            func.max(RESPONSE_TIME_MS).label('max_response_time'),
+            REQUEST_COUNT.label('request_count'),
         ).filter(
             APIAnalytics.created_at.between(start_date, end_date)
         ).group_by(
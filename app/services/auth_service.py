@@ -1,6 +1,7 @@
 from app.config.settings import settings
 from app.core.security import hash_password, verify_password
 from app.core.jwt import create_access_token, create_refresh_token, decode_token
+from app.core.dependencies import invalidate_user
 from app.services import session_service, audit_service, email_service
 from app import models
 from app.services.d1_service import database
@@ -86,6 +87,8 @@ def authenticate_user(email: str, password: str = None, user_agent: str = None,
     """
     Authenticate user with email/password or OAuth.
     If oauth_user is provided, skip password verification.
+    Returns the tokens plus the authenticated user row under "user", so
+    callers don't need to look the user up again.
     """
     if oauth_user:
         # OAuth authentication - user already validated
@@ -108,7 +111,7 @@ def authenticate_user(email: str, password: str = None, user_agent: str = None,
     access = create_access_token(str(user["id"]), expires_delta=settings.ACCESS_TOKEN_EXPIRE_SECONDS)
     refresh = create_refresh_token(str(user["id"]), expires_delta=settings.REFRESH_TOKEN_EXPIRE_SECONDS)
     audit_service.log(user["id"], "auth.success", {"session_id": session})
-    return {"access_token": access, "refresh_token": refresh, "token_type": "bearer"}
+    return {"access_token": access, "refresh_token": refresh, "token_type": "bearer", "user": user}
 
 
 def refresh_tokens(refresh_token: str):
@@ -128,5 +131,6 @@ def logout(refresh_token: str):
     if not payload:
         return False
     user_id = payload.get("sub")
+    invalidate_user(user_id)
     audit_service.log(user_id, "auth.logout", {})
     return True
@@ -0,0 +1,115 @@
+"""
+Request coalescing for permission lookups.
+A require_permission check runs its query straight away when no other is
+in flight; checks that arrive while one is running share the next
+UNION ALL query instead of each issuing their own.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, String, literal, select, union_all
+
+from app.models import roles, groups, user_groups, user_permissions
+from app.services.d1_service import database
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionBatcher:
+    """Collects (user_id, role) lookups and resolves them in one query."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: Dict[Tuple[int, str], Future] = {}
+        self._flushing = False
+
+    def get_role_and_user_perms(self, user_id: int, role: str) -> List[dict]:
+        """
+        Return the role, user-level and group permission rows for a user as
+        {"source", "permissions", "perm_bits"} dicts. With no query in
+        flight the caller runs the batch itself without waiting; otherwise
+        it waits, and whichever waiter is still unresolved when the running
+        query finishes runs the next batch for everyone queued behind it.
+        """
+        key = (user_id, role)
+        with self._cond:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+            while self._flushing and not future.done():
+                self._cond.wait()
+            batch = None
+            if not future.done():
+                self._flushing = True
+                batch, self._pending = self._pending, {}
+
+        if batch is not None:
+            self._flush(batch)
+        return future.result()
+
+    def _flush(self, batch: Dict[Tuple[int, str], Future]) -> None:
+        try:
+            self._resolve(batch)
+        except Exception as e:
+            logger.error(f"Permission batch query failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._cond.notify_all()
+
+    def _resolve(self, batch: Dict[Tuple[int, str], Future]) -> None:
+        rows = database.fetch_all(self._build_query(batch))
+        by_user: Dict[int, List[dict]] = {}
+        by_role: Dict[str, List[dict]] = {}
+        for row in rows:
+            entry = {
+                "source": row["source"],
+                "permissions": row["permissions"],
+                "perm_bits": row["perm_bits"],
+            }
+            if row["source"] == "role":
+                by_role.setdefault(row["role_name"], []).append(entry)
+            else:
+                by_user.setdefault(row["user_id"], []).append(entry)
+
+        for (user_id, role), future in batch.items():
+            future.set_result(by_role.get(role, []) + by_user.get(user_id, []))
+
+    @staticmethod
+    def _build_query(batch: Dict[Tuple[int, str], Future]):
+        user_ids = {user_id for user_id, _ in batch}
+        role_names = {role for _, role in batch}
+        return union_all(
+            select(
+                literal("role").label("source"),
+                literal(None, Integer).label("user_id"),
+                roles.c.name.label("role_name"),
+                roles.c.permissions.label("permissions"),
+                roles.c.perm_bits.label("perm_bits"),
+            ).where(roles.c.name.in_(role_names)),
+            select(
+                literal("user").label("source"),
+                user_permissions.c.user_id.label("user_id"),
+                literal(None, String).label("role_name"),
+                user_permissions.c.permission.label("permissions"),
+                user_permissions.c.perm_bits.label("perm_bits"),
+            ).where(user_permissions.c.user_id.in_(user_ids)),
+            select(
+                literal("group").label("source"),
+                user_groups.c.user_id.label("user_id"),
+                literal(None, String).label("role_name"),
+                groups.c.permissions.label("permissions"),
+                groups.c.perm_bits.label("perm_bits"),
+            ).select_from(
+                groups.join(user_groups, user_groups.c.group_id == groups.c.id)
+            ).where(user_groups.c.user_id.in_(user_ids)),
+        )
+
+
+# Singleton instance
+permission_batcher = PermissionBatcher()
@@ -1,9 +1,11 @@
 import logging
 import time
+from contextlib import contextmanager
 import sqlalchemy
-from sqlalchemy import text, create_engine
+from sqlalchemy import event, text, create_engine
 from sqlalchemy.pool import StaticPool, QueuePool
 from app.config.settings import settings
+from app.db.database import worker_connection_budget
 import os
 
 logger = logging.getLogger("lms.d1")
@@ -13,19 +15,79 @@ DATABASE_URL = settings.DATABASE_URL
 # Create engine based on database type
 is_postgres = DATABASE_URL.startswith('postgresql')
 if is_postgres:
+    # Size the pool from this worker's Core engine part of the connection
+    # budget (the ORM engine in app.db.database gets the rest), so every
+    # worker at full overflow on both engines still fits under the server's
+    # max_connections, and fail fast instead of queueing indefinitely when
+    # it is exhausted.
+    _connection_budget = worker_connection_budget()[0]
+    POOL_SIZE = settings.DB_POOL_SIZE or min(10, _connection_budget)
+    MAX_OVERFLOW = (
+        settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW >= 0
+        else max(0, _connection_budget - POOL_SIZE)
+    )
     engine = create_engine(
         DATABASE_URL,
         pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
         pool_recycle=3600,
+        connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
     )
-else:
+    logger.info(f"PostgreSQL pool: pool_size={POOL_SIZE}, max_overflow={MAX_OVERFLOW}")
+    # PostgreSQL handles concurrent writers itself
+    write_engine = engine
+elif DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+    # An in-memory database exists only on its one connection
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool
     )
+    write_engine = engine
+
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        # SQLite ignores FOREIGN KEY clauses (and ON DELETE CASCADE) unless
+        # enabled per connection
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+else:
+    # File-backed SQLite in WAL mode: readers run concurrently on a pool of
+    # connections while writes queue for a single writer connection instead
+    # of contending for the database lock
+    SQLITE_PRAGMAS = (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "temp_store=MEMORY",
+        "cache_size=-64000",  # 64 MB page cache per connection
+        "mmap_size=268435456",  # 256 MB
+        "busy_timeout=5000",
+        "foreign_keys=ON",  # enforce FKs and ON DELETE CASCADE
+    )
+
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=8,
+        max_overflow=4,
+    )
+    write_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(write_engine, "connect", _set_sqlite_pragmas)
 
 
 def get_connection():
@@ -33,6 +95,11 @@ def get_connection():
     return engine.connect()
 
 
+def get_write_connection():
+    """Get a connection for writes (the single writer connection on SQLite)"""
+    return write_engine.connect()
+
+
 # Create a database-like object for backward compatibility
 class DatabaseWrapper:
     """Wrapper to provide databases-library-like interface"""
@@ -50,7 +117,7 @@ class DatabaseWrapper:
     
     def execute(self, query, values=None):
         """Execute a query and return result"""
-        connection = get_connection()
+        connection = get_write_connection()
         try:
             # Handle both text queries and SQLAlchemy selectables
             if isinstance(query, str):
@@ -70,6 +137,52 @@ class DatabaseWrapper:
         finally:
             connection.close()
     
+    def execute_many(self, query, values):
+        """Execute one statement for a list of parameter sets (executemany) in one call"""
+        if not values:
+            return
+        connection = get_write_connection()
+        try:
+            if isinstance(query, str):
+                query = text(query)
+            
+            connection.execute(query, values)
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Database execute_many error: {e}")
+            raise
+        finally:
+            connection.close()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Yield a write connection whose statements commit together when the
+        block exits, or roll back together if it raises
+        """
+        with write_engine.begin() as connection:
+            yield connection
+    
+    def execute_returning(self, query, values=None):
+        """Execute a write with a RETURNING clause and return the first row"""
+        connection = get_write_connection()
+        try:
+            # Handle both text queries and SQLAlchemy selectables
+            if isinstance(query, str):
+                query = text(query)
+            
+            result = connection.execute(query, values or {})
+            row = result.fetchone()
+            connection.commit()
+            return dict(row._mapping) if row else None
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Database execute_returning error: {e}")
+            raise
+        finally:
+            connection.close()
+    
     def fetch_all(self, query, values=None):
         """Fetch all rows from a query"""
         connection = get_connection()
@@ -88,6 +201,30 @@ class DatabaseWrapper:
         finally:
             connection.close()
     
+    def iterate(self, query, values=None):
+        """
+        Yield rows one at a time as dicts, streaming them from a server-side
+        cursor instead of loading the whole result first. The connection is
+        held until the generator is exhausted or closed.
+        """
+        connection = get_connection()
+        try:
+            # Handle both text queries and SQLAlchemy selectables
+            if isinstance(query, str):
+                query = text(query)
+            
+            result = connection.execution_options(stream_results=True, yield_per=100).execute(
+                query, values or {}
+            )
+            for row in result:
+                yield dict(row._mapping)
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Database iterate error: {e}")
+            raise
+        finally:
+            connection.close()
+    
     def fetch_one(self, query, values=None):
         """Fetch one row from a query"""
         connection = get_connection()
@@ -132,7 +269,7 @@ def init_db():
     # connect and run SQL migrations (demo: run single SQL file)
     t0 = time.time()
     logger.info("d1.init_db: connecting to database at %s", DATABASE_URL)
-    connection = get_connection()
+    connection = get_write_connection()
     logger.info("d1.init_db: connected (%.3f sec)", time.time() - t0)
     try:
         # apply existing migrations
@@ -182,7 +319,7 @@ def init_db():
 
 
 def create_message(content: str, video_id: str = None):
-    connection = get_connection()
+    connection = get_write_connection()
     try:
         query = text("INSERT INTO messages (content, video_id) VALUES (:content, :video_id)")
         connection.execute(query, {"content": content, "video_id": video_id})
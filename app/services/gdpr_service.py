@@ -8,6 +8,7 @@ from datetime import datetime
 
 from app.models import users, sessions, audit_logs
 from app.services.d1_service import database
+from app.core.dependencies import invalidate_user
 
 logger = logging.getLogger(__name__)
 
@@ -141,6 +142,7 @@ class GDPRService:
             # Delete user
             delete_user = users.delete().where(users.c.id == user_id)
             database.execute(delete_user)
+            invalidate_user(user_id)
             
             logger.info(f"User {user_id} HARD DELETED")
             return {
@@ -171,6 +173,7 @@ class GDPRService:
                 consent=False,
             )
             database.execute(anonymize_user)
+            invalidate_user(user_id)
             
             # Revoke all sessions
             revoke_sessions = sessions.update().where(
@@ -225,6 +228,7 @@ class GDPRService:
             consent=consent,
         )
         database.execute(update_query)
+        invalidate_user(user_id)
         
         logger.info(f"User {user_id} consent updated to: {consent}")
         
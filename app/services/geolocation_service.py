@@ -1,7 +1,6 @@
 import logging
 from typing import Optional, Dict
 import httpx
-from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +14,6 @@ class GeolocationService:
         self.api_url = "https://ipapi.co/{ip}/json/"
         self.timeout = 2.0  # Quick timeout to not slow down requests
         
-    @lru_cache(maxsize=1000)
     async def get_location(self, ip_address: str) -> Optional[Dict]:
         """
         Get geolocation data for an IP address
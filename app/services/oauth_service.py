@@ -7,20 +7,29 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 
 try:
+    import httpx
     from authlib.integrations.httpx_client import OAuth2Client
+    from authlib.jose import JsonWebKey, jwt as jose_jwt
+    from authlib.jose.errors import JoseError
     AUTHLIB_AVAILABLE = True
 except ImportError:
     AUTHLIB_AVAILABLE = False
     OAuth2Client = None
 
 from app.config.settings import settings
+from app.core.cache import TTLCache
 from app.models import users
 from app.services.d1_service import database
 from app.core.security import hash_password
+from app.core.dependencies import invalidate_user
 from app.services.email_service import send_security_notification
 
 logger = logging.getLogger(__name__)
 
+# Provider signing keys for id_token verification, keyed by JWKS URL.
+# Providers rotate keys over days, so ten minutes is safe.
+_jwks_cache = TTLCache(maxsize=4, ttl=600)
+
 
 class OAuthService:
     """Service for handling OAuth authentication flows."""
@@ -36,6 +45,8 @@ class OAuthService:
         self.google_auth_url = "https://accounts.google.com/o/oauth2/v2/auth"
         self.google_token_url = "https://oauth2.googleapis.com/token"
         self.google_userinfo_url = "https://www.googleapis.com/oauth2/v2/userinfo"
+        self.google_jwks_url = "https://www.googleapis.com/oauth2/v3/certs"
+        self.google_issuers = ["https://accounts.google.com", "accounts.google.com"]
         
         # LinkedIn OAuth configuration
         self.linkedin_client_id = settings.LINKEDIN_CLIENT_ID
@@ -44,6 +55,44 @@ class OAuthService:
         self.linkedin_auth_url = "https://www.linkedin.com/oauth/v2/authorization"
         self.linkedin_token_url = "https://www.linkedin.com/oauth/v2/accessToken"
         self.linkedin_userinfo_url = "https://api.linkedin.com/v2/userinfo"
+        self.linkedin_jwks_url = "https://www.linkedin.com/oauth/openid/jwks"
+        self.linkedin_issuers = ["https://www.linkedin.com/oauth"]
+    
+    def _get_jwks(self, jwks_url: str):
+        """Return the provider's key set, fetching it at most every ten minutes."""
+        key_set = _jwks_cache.get(jwks_url)
+        if key_set is None:
+            resp = httpx.get(jwks_url, timeout=5)
+            resp.raise_for_status()
+            key_set = JsonWebKey.import_key_set(resp.json())
+            _jwks_cache.set(jwks_url, key_set)
+        return key_set
+    
+    def _verify_id_token(self, token: Dict[str, Any], jwks_url: str, issuers: list, client_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the claims of the token response's id_token when it verifies
+        against the provider's cached keys, otherwise None so the caller
+        falls back to the userinfo endpoint.
+        """
+        id_token = token.get("id_token")
+        if not id_token:
+            return None
+        try:
+            claims = jose_jwt.decode(
+                id_token,
+                self._get_jwks(jwks_url),
+                claims_options={
+                    "iss": {"essential": True, "values": issuers},
+                    "aud": {"essential": True, "value": client_id},
+                },
+            )
+            claims.validate()
+        except (JoseError, httpx.HTTPError, ValueError) as e:
+            logger.warning(f"id_token verification failed, using userinfo: {e}")
+            return None
+        if not claims.get("email"):
+            return None
+        return dict(claims)
     
     def get_google_auth_url(self, state: str) -> str:
         """Generate Google OAuth authorization URL."""
@@ -97,12 +146,17 @@ class OAuthService:
             grant_type="authorization_code",
         )
         
-        # Fetch user info
-        resp = client.get(
-            self.google_userinfo_url,
-            token=token,
-        )
-        user_info = resp.json()
+        # The verified id_token carries the profile; only fetch userinfo
+        # when it is missing or doesn't verify
+        claims = self._verify_id_token(token, self.google_jwks_url, self.google_issuers, self.google_client_id)
+        if claims is not None:
+            user_info = {**claims, "id": claims["sub"]}
+        else:
+            resp = client.get(
+                self.google_userinfo_url,
+                token=token,
+            )
+            user_info = resp.json()
         
         return {
             "provider": "google",
@@ -130,12 +184,15 @@ class OAuthService:
             grant_type="authorization_code",
         )
         
-        # Fetch user info
-        resp = client.get(
-            self.linkedin_userinfo_url,
-            token=token,
-        )
-        user_info = resp.json()
+        # The verified id_token carries the profile; only fetch userinfo
+        # when it is missing or doesn't verify
+        user_info = self._verify_id_token(token, self.linkedin_jwks_url, self.linkedin_issuers, self.linkedin_client_id)
+        if user_info is None:
+            resp = client.get(
+                self.linkedin_userinfo_url,
+                token=token,
+            )
+            user_info = resp.json()
         
         return {
             "provider": "linkedin",
@@ -200,6 +257,7 @@ class OAuthService:
                 last_login=datetime.utcnow(),
             )
             database.execute(update_query)
+            invalidate_user(existing_email_user["id"])
             
             # Send security notification about OAuth link
             try:
@@ -2,22 +2,106 @@
 Permission management service for RBAC.
 Handles roles, groups, user permissions, and permission checking.
 """
+import json
 import logging
-from typing import List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set
 from datetime import datetime
 
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.cache import TTLCache
 from app.models import (
     roles, groups, user_groups, user_permissions,
-    users
+    users, permissions as permissions_table
 )
 from app.services.d1_service import database
 
 logger = logging.getLogger(__name__)
 
+# perm_bits is a signed BIGINT, so bits 0-62 are usable
+MAX_PERMISSION_BITS = 63
+
+# name -> bit mask from the permissions table. A lookup miss reloads it (see
+# get_permission_bit), so permissions registered by another worker are seen
+# without waiting for the copy to expire.
+_permission_bits_cache = TTLCache(maxsize=1, ttl=60)
+
+# Names that just missed in the reloaded map, so repeated checks for a name
+# nobody registered don't reload it on every request
+_permission_miss_cache = TTLCache(maxsize=1024, ttl=5)
+
+# user_id -> frozenset of effective permission names. Writes here drop the
+# affected users (or everything, for role and group changes); other workers
+# pick changes up once their copy expires.
+_user_permissions_cache = TTLCache(maxsize=10_000, ttl=60)
+
 
 class PermissionService:
     """Service for managing roles, groups, and permissions."""
     
+    # Bumped on every role write in this process, so callers can key caches
+    # of role data on it
+    roles_version = 0
+    
+    def get_permission_bits(self) -> Dict[str, int]:
+        """Get the permission name -> bit mask map."""
+        bit_map = _permission_bits_cache.get("all")
+        if bit_map is None:
+            rows = database.fetch_all(permissions_table.select())
+            bit_map = {row["name"]: 1 << row["id"] for row in rows}
+            _permission_bits_cache.set("all", bit_map)
+        return bit_map
+    
+    def get_permission_bit(self, name: str) -> int:
+        """Get the bit mask for one permission name, or 0 if it isn't registered."""
+        bit = self.get_permission_bits().get(name)
+        if bit is None and _permission_miss_cache.get(name) is None:
+            # Possibly registered by another worker since the map was loaded
+            _permission_miss_cache.set(name, True)
+            _permission_bits_cache.clear()
+            bit = self.get_permission_bits().get(name)
+        return bit or 0
+    
+    def _register_permission(self, name: str) -> int:
+        """Assign the next free bit to a new permission name."""
+        # Each attempt either inserts, or loses to a concurrent writer that
+        # registered this name or took the bit; a loss re-reads and tries again
+        for _ in range(MAX_PERMISSION_BITS):
+            existing = database.fetch_val(
+                select(permissions_table.c.id).where(permissions_table.c.name == name)
+            )
+            if existing is not None:
+                break
+            next_id = database.fetch_val(
+                select(func.coalesce(func.max(permissions_table.c.id) + 1, 0))
+            )
+            if next_id >= MAX_PERMISSION_BITS:
+                raise ValueError(f"Cannot register permission '{name}': all {MAX_PERMISSION_BITS} bits are in use")
+            try:
+                database.execute(permissions_table.insert().values(id=next_id, name=name))
+            except IntegrityError:
+                continue
+            existing = next_id
+            break
+        else:
+            raise ValueError(f"Failed to register permission '{name}'")
+        _permission_bits_cache.clear()
+        _permission_miss_cache.pop(name)
+        return 1 << existing
+    
+    def permission_mask(self, names: Iterable[str]) -> int:
+        """OR together the bits for `names`, registering unknown names."""
+        bit_map = self.get_permission_bits()
+        mask = 0
+        for name in names:
+            bit = bit_map.get(name)
+            if bit is None:
+                bit = self._register_permission(name)
+                bit_map = self.get_permission_bits()
+            mask |= bit
+        return mask
+    
     def get_role_by_name(self, role_name: str) -> Optional[dict]:
         """Get role by name."""
         query = roles.select().where(roles.c.name == role_name)
@@ -43,16 +127,18 @@ class PermissionService:
             raise ValueError(f"Role '{name}' already exists")
         
         # Convert permissions list to JSON string
-        import json
         permissions_json = json.dumps(permissions)
         
         insert_query = roles.insert().values(
             name=name,
             permissions=permissions_json,
+            perm_bits=self.permission_mask(permissions),
             description=description,
             created_at=datetime.utcnow(),
         )
         role_id = database.execute(insert_query)
+        self.roles_version += 1
+        _user_permissions_cache.clear()
         
         # Fetch created role
         query = roles.select().where(roles.c.id == role_id)
@@ -69,8 +155,8 @@ class PermissionService:
         update_values = {}
         
         if permissions is not None:
-            import json
             update_values["permissions"] = json.dumps(permissions)
+            update_values["perm_bits"] = self.permission_mask(permissions)
         
         if description is not None:
             update_values["description"] = description
@@ -82,6 +168,8 @@ class PermissionService:
             roles.c.id == role_id
         ).values(**update_values)
         database.execute(update_query)
+        self.roles_version += 1
+        _user_permissions_cache.clear()
         
         # Fetch updated role
         query = roles.select().where(roles.c.id == role_id)
@@ -99,6 +187,8 @@ class PermissionService:
         
         delete_query = roles.delete().where(roles.c.id == role_id)
         database.execute(delete_query)
+        self.roles_version += 1
+        _user_permissions_cache.clear()
         return True
     
     def get_all_groups(self) -> List[dict]:
@@ -114,12 +204,12 @@ class PermissionService:
         description: Optional[str] = None,
     ) -> dict:
         """Create a new group."""
-        import json
         permissions_json = json.dumps(permissions)
         
         insert_query = groups.insert().values(
             name=name,
             permissions=permissions_json,
+            perm_bits=self.permission_mask(permissions),
             description=description,
             created_at=datetime.utcnow(),
         )
@@ -140,8 +230,8 @@ class PermissionService:
         update_values = {}
         
         if permissions is not None:
-            import json
             update_values["permissions"] = json.dumps(permissions)
+            update_values["perm_bits"] = self.permission_mask(permissions)
         
         if description is not None:
             update_values["description"] = description
@@ -153,6 +243,7 @@ class PermissionService:
             groups.c.id == group_id
         ).values(**update_values)
         database.execute(update_query)
+        _user_permissions_cache.clear()
         
         # Fetch updated group
         query = groups.select().where(groups.c.id == group_id)
@@ -170,6 +261,7 @@ class PermissionService:
         # Delete group
         delete_query = groups.delete().where(groups.c.id == group_id)
         database.execute(delete_query)
+        _user_permissions_cache.clear()
         return True
     
     def add_user_to_group(self, user_id: int, group_id: int) -> bool:
@@ -190,6 +282,7 @@ class PermissionService:
             created_at=datetime.utcnow(),
         )
         database.execute(insert_query)
+        self.invalidate_user_permissions(user_id)
         return True
     
     def remove_user_from_group(self, user_id: int, group_id: int) -> bool:
@@ -199,6 +292,7 @@ class PermissionService:
             (user_groups.c.group_id == group_id)
         )
         database.execute(delete_query)
+        self.invalidate_user_permissions(user_id)
         return True
     
     def get_user_groups(self, user_id: int) -> List[dict]:
@@ -230,9 +324,11 @@ class PermissionService:
         insert_query = user_permissions.insert().values(
             user_id=user_id,
             permission=permission,
+            perm_bits=self.permission_mask([permission]),
             created_at=datetime.utcnow(),
         )
         database.execute(insert_query)
+        self.invalidate_user_permissions(user_id)
         return True
     
     def revoke_user_permission(
@@ -246,6 +342,7 @@ class PermissionService:
             (user_permissions.c.permission == permission)
         )
         database.execute(delete_query)
+        self.invalidate_user_permissions(user_id)
         return True
     
     def get_user_permissions(self, user_id: int) -> Set[str]:
@@ -253,6 +350,10 @@ class PermissionService:
         Get all permissions for a user (from role + groups + individual).
         Returns a set of permission strings.
         """
+        cached = _user_permissions_cache.get(user_id)
+        if cached is not None:
+            return set(cached)
+        
         all_permissions = set()
         
         # Get user's role permissions
@@ -264,7 +365,6 @@ class PermissionService:
         role_result = database.fetch_one(query=query, values={"user_id": user_id})
         
         if role_result and role_result["permissions"]:
-            import json
             try:
                 role_perms = json.loads(role_result["permissions"])
                 all_permissions.update(role_perms)
@@ -275,7 +375,6 @@ class PermissionService:
         user_group_list = self.get_user_groups(user_id)
         for group in user_group_list:
             if group["permissions"]:
-                import json
                 try:
                     group_perms = json.loads(group["permissions"])
                     all_permissions.update(group_perms)
@@ -289,8 +388,13 @@ class PermissionService:
         user_perms = database.fetch_all(query)
         all_permissions.update([perm["permission"] for perm in user_perms])
         
+        _user_permissions_cache.set(user_id, frozenset(all_permissions))
         return all_permissions
     
+    def invalidate_user_permissions(self, user_id: int):
+        """Drop a user's cached permissions; call after changing their role."""
+        _user_permissions_cache.pop(user_id)
+    
     def check_user_permission(
         self,
         user_id: int,
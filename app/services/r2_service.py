@@ -1,8 +1,17 @@
+import io
 import uuid
 from typing import Tuple
+from boto3.s3.transfer import TransferConfig
 from app.utils.s3_client import create_r2_client
 from app.config.settings import settings
 
+# Upload in 8 MiB parts so memory stays bounded regardless of file size
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    use_threads=True,
+)
+
 
 def upload_fileobj(fileobj, filename: str = None) -> Tuple[str, str]:
     """Upload file-like object to R2 and return (key, url)
@@ -15,7 +24,9 @@ def upload_fileobj(fileobj, filename: str = None) -> Tuple[str, str]:
         raise RuntimeError("R2 client not configured. Set R2_ENDPOINT, R2_ACCESS_KEY, and R2_SECRET_KEY.")
 
     key = f"uploads/{uuid.uuid4().hex}_{filename or 'file'}"
-    client.put_object(Bucket=settings.R2_BUCKET, Key=key, Body=fileobj)
+    if isinstance(fileobj, (bytes, bytearray)):
+        fileobj = io.BytesIO(fileobj)
+    client.upload_fileobj(fileobj, settings.R2_BUCKET, key, Config=TRANSFER_CONFIG)
     # Construct a public URL using the R2 endpoint; users may need custom domain
     url = f"{settings.R2_ENDPOINT}/{settings.R2_BUCKET}/{key}"
     return key, url
@@ -0,0 +1,83 @@
+"""
+Background task for creating monthly api_analytics partitions ahead of time
+"""
+import time
+from datetime import datetime
+from sqlalchemy import text
+from app.db.database import init_db
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month on created_at
+ANALYTICS_TABLES = ("api_analytics", "api_analytics_payloads")
+
+# pg_try_advisory_xact_lock key ("anpart") held while partitions are created
+PARTITION_LOCK_KEY = 0x616E70617274
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    """Return the first day of the month `months` after `month_start`"""
+    month_index = month_start.month - 1 + months
+    return month_start.replace(year=month_start.year + month_index // 12, month=month_index % 12 + 1)
+
+
+def ensure_analytics_partitions(months_ahead: int = 1):
+    """
+    Create api_analytics and api_analytics_payloads partitions for the
+    current month and the next `months_ahead` months if they don't exist yet.
+    
+    Rows that already landed in a table's DEFAULT partition for a new month
+    are moved into it, since PostgreSQL refuses to attach a partition whose
+    range the default partition still holds rows for.
+    """
+    engine = init_db()
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    try:
+        with engine.begin() as connection:
+            # Every worker runs this; one at a time is enough
+            if not connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY}).scalar():
+                return
+            for offset in range(months_ahead + 1):
+                start = _add_months(month_start, offset)
+                end = _add_months(start, 1)
+                for table in ANALYTICS_TABLES:
+                    partition = f"{table}_{start:%Y_%m}"
+                    if connection.execute(text("SELECT to_regclass(:name)"), {"name": partition}).scalar():
+                        continue
+                    bounds = {"start": start, "end": end}
+                    connection.execute(text(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)"))
+                    if connection.execute(text("SELECT to_regclass(:name)"), {"name": f"{table}_default"}).scalar():
+                        connection.execute(text(f"""
+                            WITH moved AS (
+                                DELETE FROM {table}_default
+                                WHERE created_at >= :start AND created_at < :end
+                                RETURNING *
+                            )
+                            INSERT INTO {partition} SELECT * FROM moved
+                        """), bounds)
+                    connection.execute(text(
+                        f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                    ))
+                    logger.info(f"Created analytics partition: {partition}")
+    except Exception as e:
+        logger.error(f"Error creating analytics partitions: {str(e)}")
+
+
+def run_partition_maintenance():
+    """
+    Run partition maintenance continuously, checking once a day
+    """
+    logger.info("Analytics partition maintenance started")
+    while True:
+        ensure_analytics_partitions()
+        # Wait a day before next check
+        time.sleep(24 * 60 * 60)
+
+
+if __name__ == "__main__":
+    # Run the partition maintenance loop
+    run_partition_maintenance()
@@ -0,0 +1,52 @@
+"""
+Background task for moving rows from the UNLOGGED api_analytics_staging
+table into the partitioned api_analytics table
+"""
+import time
+from sqlalchemy import text
+from app.db.database import init_db
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Staging and target share column order (LIKE api_analytics), so rows move
+# with SELECT *. ON CONFLICT makes a re-run after a partial failure harmless.
+FLUSH_SQL = """
+    WITH moved AS (
+        DELETE FROM api_analytics_staging RETURNING *
+    )
+    INSERT INTO api_analytics SELECT * FROM moved
+    ON CONFLICT DO NOTHING
+"""
+
+
+def flush_analytics_staging():
+    """
+    Move every staged row into api_analytics in one transaction
+    """
+    engine = init_db()
+
+    try:
+        with engine.begin() as connection:
+            moved = connection.execute(text(FLUSH_SQL)).rowcount
+        if moved:
+            logger.info(f"Flushed {moved} staged analytics rows")
+    except Exception as e:
+        logger.error(f"Error flushing analytics staging: {str(e)}")
+
+
+def run_staging_flusher():
+    """
+    Flush staged analytics rows continuously, every few seconds
+    """
+    logger.info("Analytics staging flusher started")
+    while True:
+        flush_analytics_staging()
+        # Wait a few seconds before next flush
+        time.sleep(5)
+
+
+if __name__ == "__main__":
+    # Run the staging flush loop
+    run_staging_flusher()
@@ -0,0 +1,81 @@
+"""
+Run Alembic migrations from inside the application process
+"""
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from app.config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# pg_advisory_lock key ("lmsmig") held while a worker upgrades; the other
+# workers wait for it and then find nothing left to apply
+MIGRATION_LOCK_KEY = 0x6C6D736D6967
+
+# Exposed through /health/migrations so readiness checks can wait on it
+migration_state = {
+    "status": "not_started",  # not_started | running | completed | failed | skipped
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+
+
+@contextmanager
+def _migration_lock():
+    """
+    Hold a PostgreSQL session advisory lock so only one process runs the
+    upgrade at a time (a no-op on other databases)
+    """
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        yield
+        return
+    # Own connection outside any transaction, so it doesn't hold a snapshot
+    # that CREATE INDEX CONCURRENTLY in a migration would wait on
+    engine = create_engine(settings.DATABASE_URL, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    finally:
+        engine.dispose()
+
+
+def run_migrations():
+    """
+    Upgrade the database to the latest Alembic revision (blocking)
+    """
+    migration_state.update(status="running", started_at=datetime.utcnow().isoformat(), error=None)
+    try:
+        config = Config(str(ALEMBIC_INI))
+        config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+        # Keep the application's logging setup instead of alembic.ini's
+        config.attributes["configure_logger"] = False
+        with _migration_lock():
+            command.upgrade(config, "head")
+        migration_state["status"] = "completed"
+        logger.info("Alembic migrations completed")
+    except Exception as e:
+        migration_state.update(status="failed", error=str(e))
+        logger.error(f"Alembic migrations failed: {str(e)}")
+    finally:
+        migration_state["finished_at"] = datetime.utcnow().isoformat()
+
+
+async def run_migrations_async():
+    """
+    Run migrations in a worker thread so the event loop keeps serving requests
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, run_migrations)
@@ -11,10 +11,7 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-# Load environment variables BEFORE importing settings
-from dotenv import load_dotenv
-load_dotenv()
-
+# Importing settings loads .env
 from app.config.settings import settings
 from sqlalchemy import create_engine, text
 from sqlalchemy.pool import StaticPool
@@ -98,11 +95,18 @@ CREATE TABLE IF NOT EXISTS oauth_accounts (
     UNIQUE(provider, provider_user_id)
 );
 
+-- Permission registry: id is the permission's bit in perm_bits masks
+CREATE TABLE IF NOT EXISTS permissions (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+
 -- Roles table
 CREATE TABLE IF NOT EXISTS roles (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL,
     permissions TEXT NOT NULL,
+    perm_bits BIGINT,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -112,6 +116,7 @@ CREATE TABLE IF NOT EXISTS groups (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL,
     permissions TEXT NOT NULL,
+    perm_bits BIGINT,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -170,13 +175,7 @@ CREATE TABLE IF NOT EXISTS blogs (
     image_url TEXT,
     image_alt TEXT,
     featured BOOLEAN DEFAULT FALSE,
-    meta_title TEXT,
-    meta_description TEXT,
-    canonical_url TEXT,
-    og_title TEXT,
-    og_description TEXT,
-    og_image_url TEXT,
-    og_image_alt TEXT,
+    seo TEXT DEFAULT '{}',
     word_count INTEGER DEFAULT 0,
     reading_time REAL DEFAULT 0.0,
     published BOOLEAN DEFAULT FALSE,
@@ -299,11 +298,18 @@ CREATE TABLE IF NOT EXISTS oauth_accounts (
     UNIQUE(provider, provider_user_id)
 );
 
+-- Permission registry: id is the permission's bit in perm_bits masks
+CREATE TABLE IF NOT EXISTS permissions (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+
 -- Roles table
 CREATE TABLE IF NOT EXISTS roles (
     id SERIAL PRIMARY KEY,
     name TEXT UNIQUE NOT NULL,
     permissions TEXT NOT NULL,
+    perm_bits BIGINT,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -313,6 +319,7 @@ CREATE TABLE IF NOT EXISTS groups (
     id SERIAL PRIMARY KEY,
     name TEXT UNIQUE NOT NULL,
     permissions TEXT NOT NULL,
+    perm_bits BIGINT,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -366,18 +373,12 @@ CREATE TABLE IF NOT EXISTS blogs (
     content TEXT NOT NULL,
     author TEXT NOT NULL,
     category TEXT,
-    categories TEXT DEFAULT '[]',
+    categories JSONB DEFAULT '[]'::jsonb,
     tags TEXT DEFAULT '[]',
     image_url TEXT,
     image_alt TEXT,
     featured BOOLEAN DEFAULT FALSE,
-    meta_title TEXT,
-    meta_description TEXT,
-    canonical_url TEXT,
-    og_title TEXT,
-    og_description TEXT,
-    og_image_url TEXT,
-    og_image_alt TEXT,
+    seo JSONB DEFAULT '{}'::jsonb,
     word_count INTEGER DEFAULT 0,
     reading_time REAL DEFAULT 0.0,
     published BOOLEAN DEFAULT FALSE,
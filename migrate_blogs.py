@@ -8,9 +8,7 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from dotenv import load_dotenv
-load_dotenv()
-
+# Importing d1_service pulls in settings, which loads .env
 from app.services.d1_service import database
 
 def migrate():
@@ -27,13 +25,7 @@ def migrate():
         ("slug", "ALTER TABLE blogs ADD COLUMN slug TEXT"),
         ("image_alt", "ALTER TABLE blogs ADD COLUMN image_alt TEXT"),
         ("featured", "ALTER TABLE blogs ADD COLUMN featured BOOLEAN DEFAULT FALSE"),
-        ("meta_title", "ALTER TABLE blogs ADD COLUMN meta_title TEXT"),
-        ("meta_description", "ALTER TABLE blogs ADD COLUMN meta_description TEXT"),
-        ("canonical_url", "ALTER TABLE blogs ADD COLUMN canonical_url TEXT"),
-        ("og_title", "ALTER TABLE blogs ADD COLUMN og_title TEXT"),
-        ("og_description", "ALTER TABLE blogs ADD COLUMN og_description TEXT"),
-        ("og_image_url", "ALTER TABLE blogs ADD COLUMN og_image_url TEXT"),
-        ("og_image_alt", "ALTER TABLE blogs ADD COLUMN og_image_alt TEXT"),
+        ("seo", "ALTER TABLE blogs ADD COLUMN seo TEXT DEFAULT '{}'"),
         ("word_count", "ALTER TABLE blogs ADD COLUMN word_count INTEGER DEFAULT 0"),
         ("reading_time", "ALTER TABLE blogs ADD COLUMN reading_time REAL DEFAULT 0.0"),
         ("categories", "ALTER TABLE blogs ADD COLUMN categories TEXT DEFAULT '[]'"),
@@ -49,6 +41,19 @@ def migrate():
         else:
             print(f"- Column {col_name} already exists")
     
+    # Fold any legacy per-field SEO columns into the seo JSON document
+    legacy_seo = [name for name in (
+        "meta_title", "meta_description", "canonical_url", "og_title",
+        "og_description", "og_image_url", "og_image_alt",
+    ) if name in current_col_names]
+    if legacy_seo:
+        pairs = ", ".join(f"'{name}', {name}" for name in legacy_seo)
+        database.execute(
+            f"UPDATE blogs SET seo = json_patch(COALESCE(NULLIF(seo, ''), '{{}}'), json_object({pairs})) "
+            "WHERE seo IS NULL OR seo = '' OR seo = '{}'"
+        )
+        print(f"✓ Folded {', '.join(legacy_seo)} into seo")
+    
     # Verify new schema
     new_cols = database.fetch_all('PRAGMA table_info(blogs)')
     new_col_names = [col['name'] for col in new_cols]
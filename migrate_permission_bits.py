@@ -0,0 +1,46 @@
+"""
+Migration script to backfill perm_bits from the JSON permission lists
+Run once after the add_permission_bits Alembic revision (or
+app/migrations/007_add_permission_bits.sql) has been applied;
+until then require_permission keeps reading the JSON lists.
+"""
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+# Importing d1_service pulls in settings, which loads .env
+from app.services.d1_service import database
+from app.services.permission_service import permission_service
+from app.core.dependencies import _permission_set
+from app.models import roles, groups, user_permissions
+
+def migrate():
+    database.connect()
+
+    print("Backfilling perm_bits for roles, groups and user permissions...")
+
+    for table in (roles, groups):
+        rows = database.fetch_all(table.select().where(table.c.perm_bits.is_(None)))
+        for row in rows:
+            mask = permission_service.permission_mask(sorted(_permission_set(row["permissions"])))
+            database.execute(table.update().where(table.c.id == row["id"]).values(perm_bits=mask))
+            print(f"✓ {table.name} '{row['name']}': perm_bits = {mask}")
+
+    rows = database.fetch_all(user_permissions.select().where(user_permissions.c.perm_bits.is_(None)))
+    for row in rows:
+        mask = permission_service.permission_mask([row["permission"]])
+        database.execute(
+            user_permissions.update().where(
+                (user_permissions.c.user_id == row["user_id"]) &
+                (user_permissions.c.permission == row["permission"])
+            ).values(perm_bits=mask)
+        )
+    print(f"✓ Backfilled {len(rows)} user permissions")
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,69 @@
+"""
+Migration script to add the stats_counters table and its triggers on SQLite
+PostgreSQL gets them from the add_stats_counters and shard_stats_counters
+Alembic revisions; the trigger bodies need BEGIN ... END blocks, which the
+app/migrations/*.sql runner can't split into statements.
+"""
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+# Importing d1_service pulls in settings, which loads .env
+from sqlalchemy import text
+from app.services.d1_service import database, DATABASE_URL
+
+# Tables whose row counts are kept in stats_counters
+COUNTED_TABLES = ("users", "audit_logs")
+
+def migrate():
+    if not DATABASE_URL.startswith("sqlite"):
+        print("Not a SQLite database; run the Alembic migrations instead")
+        return
+
+    database.connect()
+
+    print("Creating stats_counters and its triggers...")
+
+    # Same layout as on PostgreSQL; SQLite serializes writers anyway, so
+    # everything stays in shard 0
+    with database.transaction() as connection:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT NOT NULL,
+                shard INTEGER NOT NULL DEFAULT 0,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, shard)
+            )
+        """))
+        for table in COUNTED_TABLES:
+            connection.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_stats_counter_insert
+                AFTER INSERT ON {table}
+                BEGIN
+                    UPDATE stats_counters SET value = value + 1 WHERE name = '{table}' AND shard = 0;
+                END
+            """))
+            connection.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_stats_counter_delete
+                AFTER DELETE ON {table}
+                BEGIN
+                    UPDATE stats_counters SET value = value - 1 WHERE name = '{table}' AND shard = 0;
+                END
+            """))
+            # Seeded in the same transaction as the triggers, so no row is
+            # missed or counted twice. WHERE true keeps SQLite from reading
+            # ON CONFLICT as a join constraint.
+            connection.execute(text(f"""
+                INSERT INTO stats_counters (name, shard, value)
+                SELECT '{table}', 0, COUNT(*) FROM {table} WHERE true
+                ON CONFLICT (name, shard) DO UPDATE SET value = excluded.value
+            """))
+            print(f"✓ {table} counter and triggers")
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()